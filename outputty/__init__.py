@@ -23,16 +23,37 @@ You can write your own plugin easily (see ``outputty/plugin_*.py`` for
 examples). Some examples of plugins are: CSV, text, HTML and histogram.
 """
 
+import array
+import bisect
+import cPickle
 import datetime
+import functools
+import heapq
+import inspect
+import multiprocessing
+import operator
+import random
 import re
+import sys
+import tempfile
 import types
 from collections import Counter
+from itertools import chain, ifilter, imap, islice, izip
 
 
 __version__ = '0.3.2'
-date_regex = re.compile('^[0-9]{4}-[0-9]{2}-[0-9]{2}$')
-datetime_regex = re.compile('^[0-9]{4}-[0-9]{2}-[0-9]{2} '
-                            '[0-9]{2}:[0-9]{2}:[0-9]{2}$')
+date_regex = re.compile('^([0-9]{4})-([0-9]{2})-([0-9]{2})$')
+datetime_regex = re.compile('^([0-9]{4})-([0-9]{2})-([0-9]{2}) '
+                            '([0-9]{2}):([0-9]{2}):([0-9]{2})$')
+TYPES = (int, float, datetime.date, datetime.datetime, str)
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3,
+              'TB': 1024 ** 4}
+SPILL_BLOCK_ROWS = 10000
+SPILL_BATCH_ROWS = 1000
+SORT_RUN_ROWS = 100000
+OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+             '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+             'in': lambda value, values: value in values}
 
 def _str_decode(element, codec):
     if isinstance(element, str):
@@ -46,10 +67,1442 @@ def _unicode_encode(element, codec):
     else:
         return element
 
+def _to_int(value):
+    if value is None or value == '':
+        return None
+    converted = int(value)
+    if str(converted) != str(value):
+        raise ValueError('It is float')
+    return converted
+
+def _to_float(value):
+    if value is None or value == '':
+        return None
+    return float(value)
+
+def _to_date(value):
+    if value is None or value == '':
+        return None
+    if not isinstance(value, basestring):
+        value = unicode(value)
+    match = date_regex.match(value)
+    if match is None:
+        raise ValueError('It is not a date')
+    year, month, day = match.groups()
+    return datetime.date(int(year), int(month), int(day))
+
+def _to_datetime(value):
+    if value is None or value == '':
+        return None
+    if not isinstance(value, basestring):
+        value = unicode(value)
+    match = datetime_regex.match(value)
+    if match is None:
+        raise ValueError('It is not a datetime')
+    year, month, day, hour, minute, second = match.groups()
+    return datetime.datetime(int(year), int(month), int(day), int(hour),
+                             int(minute), int(second))
+
+CONVERTERS = {int: _to_int, float: _to_float, datetime.date: _to_date,
+              datetime.datetime: _to_datetime}
+
+def _converter(type_, codec):
+    """Return a function that converts one value to ``type_`` (empty values
+    to ``None``), raising ``ValueError`` if it can't be represented."""
+    if type_ in CONVERTERS:
+        return CONVERTERS[type_]
+    return lambda value: _convert(value, type_, codec)
+
+def _can_be(value, type_):
+    """Return ``False`` if ``value`` can't be represented as ``type_`` (a
+    type in ``TYPES``)."""
+    if type_ is str:
+        return True
+    try:
+        CONVERTERS[type_](value)
+    except (ValueError, TypeError):
+        return False
+    return True
+
+def _cant_be(column):
+    """Return the ``set`` of types (from ``TYPES``) that can't represent all
+    the values in ``column``."""
+    cant_be = set()
+    candidates = list(TYPES[:-1])
+    for value in column:
+        for type_ in candidates:
+            if not _can_be(value, type_):
+                cant_be.add(type_)
+        if cant_be:
+            candidates = [x for x in candidates if x not in cant_be]
+            if not candidates:
+                break
+    return cant_be
+
+def _typed(column):
+    """Return the type of the values in ``column`` if all of them (except
+    ``None``) have the same type (and it is not ``str``/``unicode``)."""
+    typed = None
+    for value in column:
+        if value is None:
+            continue
+        type_ = type(value)
+        if type_ is str or type_ is unicode or \
+           typed is not None and type_ is not typed:
+            return None
+        typed = type_
+    return typed
+
+class ParseCache(object):
+    """Statistics of a bounded cache of converted values (keyed by the raw
+    value) used by ``_normalize``, so repeated values are parsed only once.
+    Only strings are cached: other values (e.g. ``3`` and ``3.0``, which are
+    equal) are always converted.
+
+    The cache is an approximate LRU with two generations of at most
+    ``size / 2`` values each: when the recent one is full it replaces the
+    old one, and values found in the old one are moved to the recent one.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return '<ParseCache hits={} misses={} hit_rate={:.2f}>'.format(
+                self.hits, self.misses, self.hit_rate)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / float(total) if total else 0.0
+
+    def wrap(self, convert):
+        """Return a function that works like ``convert`` using a new cache.
+        """
+        generations = [{}, {}]
+        limit = max(self.size // 2, 1)
+        def cached(value):
+            if not isinstance(value, basestring):
+                return convert(value)
+            recent = generations[0]
+            if value in recent:
+                self.hits += 1
+                return recent[value]
+            old = generations[1]
+            if value in old:
+                self.hits += 1
+                result = old[value]
+            else:
+                self.misses += 1
+                result = convert(value)
+            if len(recent) >= limit:
+                generations[1] = recent
+                recent = generations[0] = {}
+            recent[value] = result
+            return result
+        return cached
+
+def _normalize(column, codec, type_=None, cache=None):
+    """Identify the type of ``column`` and convert its values in the same
+    pass, trying each type's converter until one accepts all the values.
+    Return ``(type_, values)``; ``type_`` (if not ``None``) is tried first.
+    If ``cache`` (a ``ParseCache``) is not ``None`` numbers, dates and
+    datetimes are parsed through it.
+    """
+    if type_ in CONVERTERS:
+        convert = CONVERTERS[type_]
+        if cache is not None:
+            convert = cache.wrap(convert)
+        try:
+            return type_, [convert(value) for value in column]
+        except (ValueError, TypeError):
+            pass
+    if not column:
+        return str, column
+    typed = _typed(column)
+    if typed is not None:
+        return typed, column
+    for type_ in TYPES:
+        convert = _converter(type_, codec)
+        if cache is not None and type_ in CONVERTERS:
+            convert = cache.wrap(convert)
+        try:
+            return type_, [convert(value) for value in column]
+        except (ValueError, TypeError):
+            pass
+
+def _sample(column, size):
+    """Return the first ``size / 2`` values of ``column`` plus random values
+    from the rest of it (``size`` values in total)."""
+    if len(column) <= size:
+        return column
+    head = size // 2
+    indexes = random.sample(xrange(head, len(column)), size - head)
+    return column[:head] + [column[index] for index in sorted(indexes)]
+
+def _schema(types, codec):
+    """Return a copy of ``types`` (a ``dict`` mapping header to type, or
+    ``None``) with decoded headers."""
+    return {_str_decode(header, codec): type_
+            for header, type_ in (types or {}).items()}
+
+def _normalize_column(job):
+    """Normalize one column (used by ``Table.normalize_types``); ``job`` is
+    ``(column, codec, sample, numpy, cache_size, declared)``. Return
+    ``(type_, values, cache)``. If ``declared`` is not ``None`` the column
+    is converted to it without identifying its type."""
+    column, codec, sample, numpy, cache_size, declared = job
+    cache = ParseCache(cache_size) if cache_size else None
+    if declared is not None:
+        convert = _converter(declared, codec)
+        if cache is not None and declared in CONVERTERS:
+            convert = cache.wrap(convert)
+        return declared, [convert(value) for value in column], cache
+    normalize = _normalize
+    if numpy:
+        from outputty.vectorized import normalize
+    type_ = None
+    if sample is not None and len(column) > sample:
+        type_ = normalize(_sample(column, sample), codec)[0]
+    type_, values = normalize(column, codec, type_, cache)
+    return type_, values, cache
+
+def _best_type(cant_be):
+    return [type_ for type_ in TYPES if type_ not in cant_be][0]
+
+def _convert(value, type_, codec):
+    if value is None or value == '':
+        return None
+    elif type_ == datetime.date:
+        info = [int(x) for x in value.split('-')]
+        return datetime.date(*info)
+    elif type_ == datetime.datetime:
+        info = value.split()
+        date = [int(x) for x in info[0].split('-')]
+        rest = [int(x) for x in info[1].split(':')]
+        return datetime.datetime(*(date + rest))
+    elif type_ == str:
+        if isinstance(value, unicode):
+            return value
+        else:
+            if not isinstance(value, str):
+                value = str(value)
+            return value.decode(codec)
+    else:
+        return type_(value)
+
+def _conditions(where):
+    if isinstance(where, tuple):
+        return [where]
+    return where
+
+def _literal_type(value):
+    """Return the type fields are converted to before being compared to
+    ``value`` (``float`` for any number, see ``_to_number``)."""
+    if value is None or isinstance(value, unicode):
+        return str
+    if isinstance(value, (int, long, float)) and not isinstance(value, bool):
+        return float
+    return type(value)
+
+def _to_number(value):
+    """Convert ``value`` to ``int`` or, if it isn't one, ``float``."""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def _predicate(where, headers, codec):
+    """Return a function that receives a row (``list`` of values in the
+    order of ``headers``, converted or not) and returns ``True`` if it
+    matches ``where``.
+
+    ``where`` can be a function (which will receive the row as a ``dict``),
+    a condition ``(column, operator, value)`` (``operator`` is a key of
+    ``OPERATORS``) or a list of conditions (all of them must match). Like in
+    SQL, ``None`` values only match ``('column', '==', None)`` and
+    ``('column', '!=', None)`` means "is not ``None``". Not converted values
+    are converted to the type of ``value`` (of each value, for ``'in'``)
+    before comparing; for numbers, to ``int`` or ``float`` (so ``3.5``
+    matches ``('column', '>', 3)`` as it does after conversion).
+    """
+    if callable(where):
+        return lambda row: where(dict(zip(headers, row)))
+    conditions = []
+    for column, operator_, value in _conditions(where):
+        if operator_ not in OPERATORS or \
+           (value is None and operator_ not in ('==', '!=')):
+            raise ValueError('Invalid operator: {}'.format(operator_))
+        if operator_ == 'in':
+            value = [_str_decode(item, codec) for item in value]
+            groups = {}
+            for item in value:
+                groups.setdefault(_literal_type(item), []).append(item)
+            groups = groups.items()
+        else:
+            value = _str_decode(value, codec)
+            groups = [(_literal_type(value), value)]
+        groups = [(_to_number if type_ is float else
+                   functools.partial(_convert, type_=type_, codec=codec),
+                   group_value) for type_, group_value in groups]
+        index = headers.index(_str_decode(column, codec))
+        conditions.append((index, OPERATORS[operator_], value, groups))
+
+    def matches(field, compare, value):
+        if value is None:
+            return (field is None) == (compare is operator.eq)
+        return field is not None and compare(field, value)
+
+    def predicate(row):
+        for index, compare, value, groups in conditions:
+            field = row[index]
+            if not isinstance(field, basestring):
+                if not matches(field, compare, value):
+                    return False
+                continue
+            for convert, group_value in groups:
+                try:
+                    if matches(convert(field), compare, group_value):
+                        break
+                except (ValueError, TypeError):
+                    pass
+            else:
+                return False
+        return True
+    return predicate
+
+
+class _TypeTracker(object):
+    """Count, for each column of ``rows``, the types of its values and how
+    many of them can't be represented by each type in ``TYPES``, so the
+    types can be identified without reading the rows again (see
+    ``Table.track_types``). Rows appended directly to ``rows`` are counted
+    by ``update``; other changes must be counted using ``count``."""
+    def __init__(self, rows, number_of_columns):
+        self.rows = rows
+        self.tracked = 0
+        self.value_types = [Counter() for index in range(number_of_columns)]
+        self.cant_be = [Counter() for index in range(number_of_columns)]
+        self.update()
+
+    def update(self):
+        for index in xrange(self.tracked, len(self.rows)):
+            self.count(self.rows[index], 1)
+
+    def count(self, row, increment):
+        """Count ``row`` as added (``increment=1``) or removed (``-1``)."""
+        for value, value_types, cant_be in izip(row, self.value_types,
+                                                self.cant_be):
+            value_types[type(value)] += increment
+            for type_ in CONVERTERS:
+                if not _can_be(value, type_):
+                    cant_be[type_] += increment
+        self.tracked += increment
+
+    def types(self):
+        """Return the type of each column (same as
+        ``Table._identify_type_of_data``)."""
+        if not self.tracked:
+            return [str] * len(self.cant_be)
+        result = []
+        for value_types, cant_be in izip(self.value_types, self.cant_be):
+            typed = [type_ for type_, number in value_types.items()
+                     if number and type_ is not type(None)]
+            if len(typed) == 1 and typed[0] not in (str, unicode):
+                result.append(typed[0])
+            else:
+                result.append(_best_type([type_ for type_, number in
+                                          cant_be.items() if number]))
+        return result
+
+
+class _Column(object):
+    """Base class of the columns stored in arrays (see ``_Columns``)."""
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _TypedColumn(_Column):
+    """A column of ``int``, ``float``, ``datetime.date`` or
+    ``datetime.datetime`` values stored in an ``array.array`` (dates as
+    ordinals, datetimes as microseconds since ``datetime.datetime.min``)
+    plus a mask of ``None`` values. Storing a value of another type raises
+    ``TypeError`` (``_Columns`` replaces the column by a ``list``)."""
+    CODES = {int: 'l', float: 'd', datetime.date: 'l',
+             datetime.datetime: 'l'}
+
+    def __init__(self, type_, values=()):
+        self.type_ = type_
+        self.data = array.array(self.CODES[type_])
+        self.nulls = bytearray()
+        self.extend(values)
+
+    def _encode(self, value):
+        if value is None:
+            return 0
+        type_ = type(value)
+        if type_ is not self.type_ and \
+           not (self.type_ is int and type_ is long):
+            raise TypeError('Value is not {}'.format(self.type_.__name__))
+        if type_ is datetime.date:
+            return value.toordinal()
+        elif type_ is datetime.datetime:
+            if value.tzinfo is not None:
+                raise TypeError('Value has tzinfo')
+            seconds = value.hour * 3600 + value.minute * 60 + value.second
+            return (value.toordinal() * 86400 + seconds) * 1000000 + \
+                   value.microsecond
+        return value
+
+    def _decode(self, value):
+        if self.type_ is datetime.date:
+            return datetime.date.fromordinal(value)
+        elif self.type_ is datetime.datetime:
+            days, microseconds = divmod(value, 86400000000)
+            return datetime.datetime.fromordinal(days) + \
+                   datetime.timedelta(microseconds=microseconds)
+        return value
+
+    def _values(self, data, nulls):
+        if self.type_ in (int, float):
+            return [None if null else value
+                    for value, null in izip(data, nulls)]
+        decode = self._decode
+        return [None if null else decode(value)
+                for value, null in izip(data, nulls)]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        decode = None if self.type_ in (int, float) else self._decode
+        for value, null in izip(self.data, self.nulls):
+            if null:
+                yield None
+            elif decode is None:
+                yield value
+            else:
+                yield decode(value)
+
+    def __contains__(self, value):
+        if value is None:
+            return 1 in self.nulls
+        return any(other == value for other in self)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self._values(self.data[item], self.nulls[item])
+        if self.nulls[item]:
+            return None
+        return self._decode(self.data[item])
+
+    def __setitem__(self, item, value):
+        try:
+            self.data[item] = self._encode(value)
+        except OverflowError:
+            raise TypeError('Value is too big')
+        self.nulls[item] = value is None
+
+    def __delitem__(self, item):
+        del self.data[item]
+        del self.nulls[item]
+
+    def append(self, value):
+        self.insert(len(self.data), value)
+
+    def extend(self, values):
+        values = list(values)
+        try:
+            self.data.fromlist([self._encode(value) for value in values])
+        except OverflowError:
+            raise TypeError('Value is too big')
+        self.nulls.extend([value is None for value in values])
+
+    def insert(self, index, value):
+        try:
+            self.data.insert(index, self._encode(value))
+        except OverflowError:
+            raise TypeError('Value is too big')
+        self.nulls.insert(index, value is None)
+
+    def reverse(self):
+        self.data.reverse()
+        self.nulls.reverse()
+
+    def take(self, indexes):
+        """Return a new column with the values in positions ``indexes``."""
+        column = _TypedColumn(self.type_)
+        data, nulls = self.data, self.nulls
+        column.data.fromlist([data[index] for index in indexes])
+        column.nulls.extend([nulls[index] for index in indexes])
+        return column
+
+
+class _DictionaryColumn(_Column):
+    """A column of a few distinct ``unicode`` values (or ``None``) stored as
+    an ``array.array`` of codes (positions in ``self.values``). Storing a
+    value of another type or more than ``limit`` distinct values raises
+    ``TypeError`` (``_Columns`` replaces the column by a ``list``)."""
+    def __init__(self, values=(), limit=None):
+        self.limit = limit
+        self.values = []
+        self.codes_of = {}
+        self.codes = array.array('i')
+        self.extend(values)
+
+    def _encode(self, value):
+        try:
+            return self.codes_of[value]
+        except KeyError:
+            pass
+        if value is not None and type(value) is not unicode:
+            raise TypeError('Value is not unicode')
+        if self.limit is not None and len(self.values) >= self.limit:
+            raise TypeError('Too many distinct values')
+        code = self.codes_of[value] = len(self.values)
+        self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return imap(self.values.__getitem__, self.codes)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return map(self.values.__getitem__, self.codes[item])
+        return self.values[self.codes[item]]
+
+    def __setitem__(self, item, value):
+        self.codes[item] = self._encode(value)
+
+    def __delitem__(self, item):
+        del self.codes[item]
+
+    def append(self, value):
+        self.codes.append(self._encode(value))
+
+    def extend(self, values):
+        self.codes.fromlist([self._encode(value) for value in values])
+
+    def insert(self, index, value):
+        self.codes.insert(index, self._encode(value))
+
+    def reverse(self):
+        self.codes.reverse()
+
+    def take(self, indexes):
+        """Return a new column with the values in positions ``indexes``."""
+        column = _DictionaryColumn(limit=self.limit)
+        column.values = list(self.values)
+        column.codes_of = dict(self.codes_of)
+        codes = self.codes
+        column.codes.fromlist([codes[index] for index in indexes])
+        return column
+
+    def ranks(self, key):
+        """Return the position of each value (by code) in the values sorted
+        by ``key``."""
+        values = self.values
+        order = sorted(range(len(values)), key=lambda code: key(values[code]))
+        ranks = [0] * len(values)
+        for rank, code in enumerate(order):
+            ranks[code] = rank
+        return ranks
+
+
+def _compact(type_, values):
+    """Return ``values`` as a ``_TypedColumn`` of ``type_``, if possible."""
+    if type_ in _TypedColumn.CODES:
+        try:
+            return _TypedColumn(type_, values)
+        except TypeError:
+            pass
+    return values
+
+def _dictionary(values, limit):
+    """Return ``values`` as a ``_DictionaryColumn``, if it has at most
+    ``limit`` distinct ``unicode`` values (and ``None``)."""
+    try:
+        return _DictionaryColumn(values, limit)
+    except TypeError:
+        return values
+
+def _reordered(column, indexes):
+    if isinstance(column, _Column):
+        return column.take(indexes)
+    return [column[index] for index in indexes]
+
+
+class _Columns(object):
+    """A list of rows (``Table._rows`` when ``Table(columnar=True)``) that
+    stores one list (or ``_TypedColumn``) per column. Rows are created when
+    accessed, so changing a returned row doesn't change the table: rows
+    must be replaced (using ``__setitem__``)."""
+    def __init__(self, rows=()):
+        self.columns = []
+        self.length = 0
+        self.extend(rows)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        if not self.columns:
+            return ([] for index in xrange(self.length))
+        return (list(row) for row in izip(*self.columns))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def _row(self, index):
+        return [column[index] for column in self.columns]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._row(index)
+                    for index in xrange(*item.indices(self.length))]
+        if item < -self.length or item >= self.length:
+            raise IndexError('list index out of range')
+        return self._row(item)
+
+    def __setitem__(self, item, value):
+        if isinstance(item, slice):
+            rows = list(self)
+            rows[item] = value
+            self.columns, self.length = [], 0
+            self.extend(rows)
+            return
+        if item < -self.length or item >= self.length:
+            raise IndexError('list assignment index out of range')
+        for index, value in enumerate(value):
+            try:
+                self.columns[index][item] = value
+            except TypeError:
+                self._plain(index)[item] = value
+
+    def __delitem__(self, item):
+        if isinstance(item, slice):
+            removed = len(xrange(*item.indices(self.length)))
+        elif item < -self.length or item >= self.length:
+            raise IndexError('list assignment index out of range')
+        else:
+            removed = 1
+        for column in self.columns:
+            del column[item]
+        self.length -= removed
+
+    def _plain(self, index):
+        """Replace column ``index`` by a ``list`` (when a value doesn't fit
+        in its ``_TypedColumn``) and return it."""
+        column = self.columns[index] = list(self.columns[index])
+        return column
+
+    def append(self, row):
+        if not self.length:
+            self.columns = [[] for value in row]
+        for index, value in enumerate(row):
+            try:
+                self.columns[index].append(value)
+            except TypeError:
+                self._plain(index).append(value)
+        self.length += 1
+
+    def extend(self, rows):
+        if not isinstance(rows, list):
+            rows = list(rows)
+        if not rows:
+            return
+        if not self.length:
+            self.columns = [[] for value in rows[0]]
+        for index, values in enumerate(zip(*rows)):
+            try:
+                self.columns[index].extend(values)
+            except TypeError:
+                self._plain(index).extend(values)
+        self.length += len(rows)
+
+    def insert(self, index, row):
+        if not self.length:
+            self.append(row)
+            return
+        for column_index, value in enumerate(row):
+            try:
+                self.columns[column_index].insert(index, value)
+            except TypeError:
+                self._plain(column_index).insert(index, value)
+        self.length += 1
+
+    def pop(self, index=-1):
+        row = self[index]
+        del self[index]
+        return row
+
+    def index(self, row, start=None, stop=None):
+        for index in xrange(*slice(start, stop).indices(self.length)):
+            if self._row(index) == row:
+                return index
+        raise ValueError('row is not in list')
+
+    def count(self, row):
+        indexes = None
+        for column, value in zip(self.columns, row):
+            if isinstance(column, _DictionaryColumn):
+                code = column.codes_of.get(value)
+                if code is None:
+                    return 0
+                if indexes is None:
+                    indexes = xrange(self.length)
+                codes = column.codes
+                indexes = [index for index in indexes if codes[index] == code]
+        if indexes is None:
+            return sum(1 for other in self if other == row)
+        return sum(1 for index in indexes if self._row(index) == row)
+
+    def remove(self, row):
+        del self[self.index(row)]
+
+    def reverse(self):
+        for column in self.columns:
+            column.reverse()
+
+    def sort(self, cmp=None, key=None, reverse=False):
+        rows = list(self)
+        if key is None:
+            key = lambda row: row
+        indexes = range(self.length)
+        indexes.sort(cmp=cmp, key=lambda index: key(rows[index]),
+                     reverse=reverse)
+        self.reorder(indexes)
+
+    def reorder(self, indexes):
+        """Put the rows in the order given by ``indexes``."""
+        self.columns = [_reordered(column, indexes)
+                        for column in self.columns]
+
+    def column(self, index):
+        return self.columns[index] if self.length else []
+
+    def set_column(self, index, values):
+        if self.length:
+            if not isinstance(values, _Column):
+                values = list(values)
+            self.columns[index] = values
+
+    def insert_column(self, index, values):
+        if self.length:
+            self.columns.insert(index, list(values))
+
+    def delete_column(self, index):
+        if self.length:
+            del self.columns[index]
+
+
+def _bytes(size):
+    """Return ``size`` (a number of bytes or a string such as ``'2GB'``) in
+    bytes."""
+    if size is None or isinstance(size, (int, long)):
+        return size
+    match = None
+    if isinstance(size, basestring):
+        match = re.match(r'^\s*([0-9]+(?:\.[0-9]+)?)\s*([KMGT]?B)\s*$',
+                         size.upper())
+    if match is None:
+        raise ValueError('Invalid size: {}'.format(size))
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+def _size(rows):
+    """Estimate how many bytes ``rows`` (a ``list`` of rows) use in memory."""
+    getsizeof = sys.getsizeof
+    return getsizeof(rows) + sum(getsizeof(row) + sum(imap(getsizeof, row))
+                                 for row in rows)
+
+
+class _Descending(object):
+    """A sort key that inverts the order of ``key``."""
+    __slots__ = ('key', )
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def _decorated(run, number, key):
+    for row in run:
+        yield key(row), number, row
+
+def _merged(runs, key, reverse=False):
+    """Merge ``runs`` (iterables of rows, each one sorted by ``key``) into
+    one sorted iterator. Equal rows keep the order of ``runs``, so merging
+    runs sorted by a stable sort is stable too."""
+    if reverse:
+        key = lambda row, key=key: _Descending(key(row))
+    decorated = [_decorated(run, number, key)
+                 for number, run in enumerate(runs)]
+    return (row for sort_key, number, row in heapq.merge(*decorated))
+
+def _sort_key(cmp=None, key=None):
+    """Return a function with the same order of ``list.sort(cmp, key)``."""
+    if cmp is not None:
+        wrap = functools.cmp_to_key(cmp)
+        if key is None:
+            return wrap
+        return lambda row: wrap(key(row))
+    if key is None:
+        return lambda row: row
+    return key
+
+
+class _Block(object):
+    """Some rows of a ``_SpilledRows``: in memory (``rows``) or pickled in
+    its file (``rows`` is ``None``; ``stored`` bytes from ``offset``)."""
+    __slots__ = ('rows', 'length', 'size', 'offset', 'stored')
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.length = len(rows)
+        self.size = 0
+        self.offset = self.stored = None
+
+
+class _SpilledRows(object):
+    """A list of rows (``Table._rows`` when ``Table(max_memory=...)``) kept
+    in blocks of ``block_rows`` rows. When the (estimated) size of the
+    blocks in memory exceeds ``max_memory`` bytes the oldest ones are
+    pickled to a temporary file and loaded again (one at a time) when
+    needed (the last one loaded is kept, and changes to it are pickled again
+    only when another one is loaded). Rows of spilled blocks are copies:
+    they must be replaced (using ``__setitem__``)."""
+    def __init__(self, max_memory, rows=(), block_rows=None):
+        self.max_memory = max_memory
+        self.block_rows = block_rows or SPILL_BLOCK_ROWS
+        self.blocks = []
+        self.length = 0
+        self.file = None
+        self.starts = None
+        self.cache = (None, None)
+        self.dirty = False
+        self.extend(rows)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for block in self.blocks:
+            for row in self._load(block):
+                yield row
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def _read(self, offset, count):
+        """Yield ``count`` rows pickled in ``self.file`` from ``offset``,
+        unpickling ``SPILL_BATCH_ROWS`` at a time."""
+        while count:
+            self.file.seek(offset)
+            load = cPickle.Unpickler(self.file).load
+            rows = [load() for index in xrange(min(count, SPILL_BATCH_ROWS))]
+            offset = self.file.tell()
+            count -= len(rows)
+            for row in rows:
+                yield row
+
+    def _dump(self, block, rows):
+        """Pickle ``rows`` at the end of ``self.file`` as ``block``."""
+        if self.file is None:
+            self.file = tempfile.TemporaryFile()
+        self.file.seek(0, 2)
+        block.offset = self.file.tell()
+        pickler = cPickle.Pickler(self.file, cPickle.HIGHEST_PROTOCOL)
+        for row in rows:
+            pickler.dump(row)
+            pickler.clear_memo()
+        block.stored = self.file.tell() - block.offset
+        block.rows = None
+
+    def _load(self, block):
+        if block.rows is not None:
+            return block.rows
+        if self.cache[0] is not block:
+            self._flush()
+            self.cache = block, list(self._read(block.offset, block.length))
+        return self.cache[1]
+
+    def _flush(self):
+        """Pickle the cached block again, if it was changed."""
+        if self.dirty:
+            self.dirty = False
+            self._dump(*self.cache)
+            self._collect()
+
+    def _store(self, block, rows, resize=True):
+        """Store ``rows`` (changed) as the rows of ``block``."""
+        if block.rows is None:
+            self.cache, self.dirty = (block, rows), True
+        else:
+            block.rows = rows
+            if resize:
+                block.size = _size(rows)
+                self._spill()
+        if block.length != len(rows):
+            self.length += len(rows) - block.length
+            block.length = len(rows)
+            self.starts = None
+            if not rows:
+                self.blocks.remove(block)
+                if self.cache[0] is block:
+                    self.cache, self.dirty = (None, None), False
+            elif len(rows) > self.block_rows:
+                self._split(block, rows)
+
+    def _split(self, block, rows):
+        """Split ``block`` (with more than ``block_rows`` rows, after
+        inserts) in two."""
+        half = len(rows) // 2
+        new = _Block(rows[half:])
+        del rows[half:]
+        block.length = len(rows)
+        self.blocks.insert(self.blocks.index(block) + 1, new)
+        if block.rows is None:
+            self._dump(new, new.rows)
+        else:
+            block.size, new.size = _size(rows), _size(new.rows)
+            self._spill()
+
+    def _spill(self):
+        """Spill the oldest blocks in memory (except the last one, which
+        receives new rows) until they fit in ``self.max_memory``."""
+        loaded = [block for block in self.blocks[:-1]
+                  if block.rows is not None]
+        used = sum(block.size for block in loaded)
+        for block in loaded:
+            if used <= self.max_memory:
+                break
+            self._dump(block, block.rows)
+            used -= block.size
+
+    def _collect(self):
+        """Rewrite ``self.file`` if most of it is garbage (rows stored again
+        or deleted)."""
+        if self.file is None:
+            return
+        spilled = [block for block in self.blocks if block.rows is None]
+        self.file.seek(0, 2)
+        if self.file.tell() <= 2 * sum(block.stored for block in spilled):
+            return
+        old_file, self.file = self.file, None
+        for block in spilled:
+            old_file.seek(block.offset)
+            load = cPickle.Unpickler(old_file).load
+            self._dump(block, [load() for index in xrange(block.length)])
+        old_file.close()
+
+    def _replace(self, rows):
+        """Store ``rows`` (an iterable, that may use the current rows)
+        instead of the current rows."""
+        new = _SpilledRows(self.max_memory, rows, self.block_rows)
+        if self.file is not None:
+            self.file.close()
+        self.blocks, self.length, self.file = new.blocks, new.length, new.file
+        self.starts, self.cache, self.dirty = None, (None, None), False
+
+    def _locate(self, index):
+        """Return the block with row ``index`` and its position there."""
+        if index < 0:
+            index += self.length
+        if index < 0 or index >= self.length:
+            raise IndexError('list index out of range')
+        if self.starts is None:
+            self.starts, start = [], 0
+            for block in self.blocks:
+                self.starts.append(start)
+                start += block.length
+        number = bisect.bisect_right(self.starts, index) - 1
+        return self.blocks[number], index - self.starts[number]
+
+    def _rows_from(self, index):
+        if index >= self.length:
+            return
+        block, position = self._locate(index)
+        blocks = self.blocks[self.blocks.index(block):]
+        rows = self._load(block)[position:]
+        for row in rows:
+            yield row
+        for block in blocks[1:]:
+            for row in self._load(block):
+                yield row
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.length)
+            if step < 0:
+                return list(self)[item]
+            return list(islice(self._rows_from(start), 0,
+                               max(stop - start, 0), step))
+        block, position = self._locate(item)
+        return self._load(block)[position]
+
+    def __setitem__(self, item, value):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.length)
+            if step != 1:
+                rows = list(self)
+                rows[item] = value
+                self._replace(rows)
+            else:
+                self._replace(chain(islice(self, start), value,
+                                    self._rows_from(max(start, stop))))
+            return
+        block, position = self._locate(item)
+        rows = self._load(block)
+        rows[position] = value
+        self._store(block, rows, resize=False)
+
+    def __delitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.length)
+            if step == 1:
+                self._replace(chain(islice(self, start),
+                                    self._rows_from(max(start, stop))))
+            else:
+                removed = set(xrange(start, stop, step))
+                self._replace(row for index, row in enumerate(self)
+                              if index not in removed)
+            return
+        block, position = self._locate(item)
+        rows = self._load(block)
+        del rows[position]
+        self._store(block, rows, resize=False)
+
+    def _last_block(self):
+        """Return the last block if it is in memory and not full; otherwise
+        start a new one (spilling the others if needed)."""
+        if self.blocks:
+            last = self.blocks[-1]
+            if last.rows is not None:
+                if last.length < self.block_rows:
+                    return last
+                last.size = _size(last.rows)
+        block = _Block([])
+        self.blocks.append(block)
+        self.starts = None
+        self._spill()
+        return block
+
+    def append(self, row):
+        self.extend([row])
+
+    def extend(self, rows):
+        rows = iter(rows)
+        for row in rows:
+            block = self._last_block()
+            block.rows.append(row)
+            block.rows.extend(islice(rows,
+                                     self.block_rows - len(block.rows)))
+            self.length += len(block.rows) - block.length
+            block.length = len(block.rows)
+
+    def insert(self, index, row):
+        if index < 0:
+            index = max(index + self.length, 0)
+        if index >= self.length:
+            self.append(row)
+            return
+        block, position = self._locate(index)
+        rows = self._load(block)
+        rows.insert(position, row)
+        if block.rows is not None:
+            block.size += _size([row]) - _size([])
+        self._store(block, rows, resize=False)
+        if block.rows is not None:
+            self._spill()
+
+    def pop(self, index=-1):
+        row = self[index]
+        del self[index]
+        return row
+
+    def index(self, row, start=None, stop=None):
+        start, stop, step = slice(start, stop).indices(self.length)
+        for index, other in enumerate(islice(self._rows_from(start), 0,
+                                             max(stop - start, 0))):
+            if other == row:
+                return start + index
+        raise ValueError('row is not in list')
+
+    def count(self, row):
+        return sum(1 for other in self if other == row)
+
+    def remove(self, row):
+        del self[self.index(row)]
+
+    def reverse(self):
+        self.blocks.reverse()
+        self.starts = None
+        for block in self.blocks:
+            rows = self._load(block)
+            rows.reverse()
+            self._store(block, rows, resize=False)
+
+    def sort(self, cmp=None, key=None, reverse=False):
+        """Sort each block and merge them (see ``_merged``), so only one
+        block (plus a few rows of each other) is loaded at a time."""
+        for block in self.blocks:
+            rows = self._load(block)
+            rows.sort(cmp=cmp, key=key, reverse=reverse)
+            self._store(block, rows, resize=False)
+        if len(self.blocks) > 1:
+            self._replace(_merged(self.runs(), _sort_key(cmp, key), reverse))
+        else:
+            self._collect()
+
+    def runs(self):
+        """Return an iterator over the rows of each block (spilled ones are
+        read a few rows at a time)."""
+        self._flush()
+        return [iter(block.rows) if block.rows is not None else
+                self._read(block.offset, block.length)
+                for block in self.blocks]
+
+    def _change_rows(self, change):
+        """Call ``change(rows)`` for the rows of each block, in order."""
+        for block in list(self.blocks):
+            rows = self._load(block)
+            change(rows)
+            self._store(block, rows)
+        self._collect()
+
+    def column(self, index):
+        return [row[index] for row in self]
+
+    def set_column(self, index, values):
+        values = iter(values)
+        def change(rows):
+            for row, value in izip(rows, values):
+                row[index] = value
+        self._change_rows(change)
+
+    def insert_column(self, index, values):
+        values = iter(values)
+        def change(rows):
+            for row, value in izip(rows, values):
+                row.insert(index, value)
+        self._change_rows(change)
+
+    def delete_column(self, index):
+        def change(rows):
+            for row in rows:
+                del row[index]
+        self._change_rows(change)
+
+
+class Row(tuple):
+    """A row of a ``Table`` (see ``Table.iter_rows``): a ``tuple`` whose
+    values can also be accessed by header (``row['header']``). Each
+    ``Table`` creates a subclass with its headers, shared by all rows."""
+    __slots__ = ()
+    _headers = ()
+    _index = {}
+
+    def __getitem__(self, item):
+        if isinstance(item, (str, unicode)):
+            try:
+                item = self._index[item]
+            except KeyError:
+                raise KeyError(item)
+        return tuple.__getitem__(self, item)
+
+    def __repr__(self):
+        return 'Row({})'.format(', '.join('{}={!r}'.format(*item)
+                                          for item in self.items()))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self._headers)
+
+    def items(self):
+        return zip(self._headers, self)
+
+
+def _sort_columns(headers, column, ordering, codec):
+    """Return a list of ``(index, descending)`` from the arguments of
+    ``Table.order_by``."""
+    if isinstance(column, basestring):
+        column = [column]
+    columns = []
+    for item in column:
+        if isinstance(item, basestring):
+            item = (item, ordering)
+        header, direction = item
+        columns.append((headers.index(_str_decode(header, codec)),
+                        direction.lower().startswith('desc')))
+    return columns
+
+def _null_key(none_high):
+    """Return a sort key for values that may be ``None``: ``None`` is greater
+    than any value if ``none_high``, otherwise smaller (it's never compared
+    to other values, so it works for dates too)."""
+    if none_high:
+        return lambda value: (value is None, value)
+    return lambda value: (value is not None, value)
+
+def _row_key(columns, nulls):
+    """Return one sort key for ``columns`` (pairs ``(index, descending)``,
+    see ``_sort_columns``), placing ``None`` values like ``Table.order_by``.
+    """
+    parts = []
+    for index, descending in columns:
+        none_high = nulls is not None and (nulls == 'first') == descending
+        parts.append((operator.itemgetter(index), _null_key(none_high),
+                      descending))
+
+    def key(row):
+        result = []
+        for getter, value_key, descending in parts:
+            value = value_key(getter(row))
+            result.append(_Descending(value) if descending else value)
+        return result
+    return key
+
+def _external_sorted(rows, key, run_size=None):
+    """Yield ``rows`` (any iterable) sorted by ``key`` (stable) using bounded
+    memory: runs of ``run_size`` rows are sorted and pickled to a temporary
+    file (see ``_SpilledRows``), then merged (see ``_merged``). All the runs
+    are stored before the first row is yielded and ``rows`` is not
+    referenced anymore, so it can be released."""
+    run_size = run_size or SORT_RUN_ROWS
+    runs = _SpilledRows(0, block_rows=run_size)
+    rows = iter(rows)
+    while True:
+        run = list(islice(rows, run_size))
+        if not run:
+            break
+        run.sort(key=key)
+        runs.extend(run)
+    del rows
+    for row in _merged(runs.runs(), key):
+        yield row
+
+def _chunk_rows(table, chunks, types, widened):
+    """Yield the rows of ``chunks`` (read by ``iter_read`` into ``table``)
+    with one type per column. The types that can't represent the values of
+    each column (see ``_cant_be``) are accumulated across chunks: if a chunk
+    doesn't fit the type of the previous ones the column is widened (e.g.
+    ``int`` to ``float`` or ``str``) and the values of the next chunks are
+    converted to it. ``types`` receives the type of each column and
+    ``widened`` the headers of the columns whose rows already yielded have
+    a narrower type (see ``_retyped``). Converted values are widened, not
+    the ones read (e.g. a ``float`` ``3.0`` read as ``3`` becomes
+    ``u'3.0'``). Types declared in ``table.schema`` are never widened."""
+    cant_be = {}
+    codec = table.input_encoding
+    for chunk in chunks:
+        for index, header in enumerate(chunk.headers):
+            type_ = chunk.types.get(header)
+            if type_ is None or header in table.schema:
+                continue
+            column = chunk._column(index)
+            if all(value is None for value in column):
+                types.setdefault(header, type_)
+                continue
+            if header not in cant_be:
+                cant_be[header] = _cant_be(column)
+                types[header] = type_
+                continue
+            if type_ is types[header]:
+                continue
+            # Chunks of the same type have the same ``_cant_be``
+            cant_be[header] |= _cant_be(column)
+            best = _best_type(cant_be[header])
+            if best is not types[header]:
+                types[header] = best
+                widened.add(header)
+            if best is not type_:
+                convert = _converter(best, codec)
+                chunk._set_column(index, [convert(value)
+                                          for value in column])
+        for row in chunk:
+            yield row
+
+def _retyped(table, types, widened):
+    """Convert the columns of ``table`` widened while reading (see
+    ``_chunk_rows``) to their final type in ``types``."""
+    for index, header in enumerate(table.headers):
+        if header in widened:
+            convert = _converter(types[header], table.input_encoding)
+            table._set_column(index, [convert(value)
+                                      for value in table._column(index)])
+        if header in types:
+            table.types[header] = types[header]
+
+def _selected(rows, indexes):
+    for row in rows:
+        yield [row[index] for index in indexes]
+
+
+class Scan(object):
+    """A lazy query (see ``Table.scan``): ``filter``, ``select`` and
+    ``order_by`` return a new ``Scan`` with one more step and nothing is
+    read until it's iterated, written or converted using ``to_table``. Rows
+    flow through all the steps one at a time (only ``order_by`` stores them,
+    in a ``Table`` with the settings of ``table``). When reading in chunks,
+    a column is widened if a chunk doesn't fit the type of the previous
+    ones (see ``_chunk_rows``): ``to_table`` and ``order_by`` convert the
+    rows already read to the widened type, other steps receive them as
+    they were read (so rows streamed by ``write`` may have narrower types).
+
+    The first filters (only conditions, not functions, which always receive
+    converted values) and select are passed to the plugin as ``where`` and
+    ``columns`` (if it accepts them), so rejected rows and fields are not
+    even converted.
+    """
+    def __init__(self, table, plugin_name, args, kwargs, steps=()):
+        self.table = table
+        self.plugin_name = plugin_name
+        self.args = args
+        self.kwargs = kwargs
+        self.steps = tuple(steps)
+
+    def _step(self, *step):
+        return Scan(self.table, self.plugin_name, self.args, self.kwargs,
+                    self.steps + (step, ))
+
+    def filter(self, where):
+        """Keep only the rows matching ``where`` (see ``_predicate``)."""
+        return self._step('filter', where)
+
+    def select(self, columns):
+        """Keep only ``columns`` (a list of headers), in this order."""
+        return self._step('select', columns)
+
+    def order_by(self, column, ordering='asc', nulls=None, external=False,
+                 run_size=None):
+        """Sort the rows (see ``Table.order_by``). If ``external`` is
+        ``True`` sorted runs are merged as rows are consumed, so the result
+        is never stored in a ``Table``."""
+        return self._step('order_by', column, ordering, nulls, external,
+                          run_size)
+
+    def _read(self):
+        """Read using the plugin, passing the first steps to it if possible.
+        Return the headers, an iterator over the rows, the types of the
+        columns and the widened ones (both filled while the rows are
+        consumed, see ``_chunk_rows``) and the other steps.
+        """
+        steps = list(self.steps)
+        kwargs = dict(self.kwargs)
+        plugin = self.table._load_plugin(self.plugin_name)
+        read = getattr(plugin, 'iter_read', plugin.read)
+        arguments = inspect.getargspec(read).args
+        where = None
+        while steps and steps[0][0] == 'filter' and 'where' in arguments \
+              and 'where' not in kwargs and not callable(steps[0][1]):
+            where = list(_conditions(where or [])) + \
+                    list(_conditions(steps.pop(0)[1]))
+        if where is not None:
+            kwargs['where'] = where
+        if steps and steps[0][0] == 'select' and 'columns' in arguments \
+           and 'columns' not in kwargs:
+            kwargs['columns'] = steps.pop(0)[1]
+        source = self.table._like()
+        if read is plugin.read:
+            read(source, *self.args, **kwargs)
+            return source.headers, iter(source), source.types, set(), steps
+        chunks = read(source, *self.args, **kwargs)
+        first = next(chunks, None)
+        types = dict(source.schema)
+        widened = set()
+        if first is None:
+            return source.headers, iter([]), types, widened, steps
+        rows = _chunk_rows(source, chain([first], chunks), types, widened)
+        return source.headers, rows, types, widened, steps
+
+    def _execute(self):
+        """Return the headers, an iterator over the rows of the result, the
+        types of the columns and the widened ones (known after the rows are
+        consumed, see ``_read``)."""
+        headers, rows, types, widened, steps = self._read()
+        codec = self.table.input_encoding
+        for step in steps:
+            if step[0] == 'filter':
+                rows = ifilter(_predicate(step[1], headers, codec), rows)
+            elif step[0] == 'select':
+                indexes = [headers.index(_str_decode(column, codec))
+                           for column in step[1]]
+                headers = [headers[index] for index in indexes]
+                rows = _selected(rows, indexes)
+            elif step[4]:
+                columns = _sort_columns(headers, step[1], step[2], codec)
+                rows = _external_sorted(rows, _row_key(columns, step[3]),
+                                        step[5])
+            else:
+                buffer_ = self.table._like(headers)
+                buffer_._rows.extend(rows)
+                _retyped(buffer_, types, widened)
+                buffer_.order_by(*step[1:4])
+                rows = iter(buffer_)
+        return headers, rows, types, widened
+
+    def __iter__(self):
+        return self._execute()[1]
+
+    def to_table(self):
+        """Execute the query and return the result as a new ``Table``."""
+        headers, rows, types, widened = self._execute()
+        table = self.table._like(headers)
+        table._rows.extend(rows)
+        _retyped(table, types, widened)
+        return table
+
+    def write(self, plugin_name, *args, **kwargs):
+        """Execute the query writing the result using plugin
+        ``plugin_name``. If the plugin has ``iter_write`` the rows are
+        written as they are produced; otherwise they are stored in a
+        ``Table`` first (see ``to_table``)."""
+        plugin = self.table._load_plugin(plugin_name)
+        if not hasattr(plugin, 'iter_write'):
+            return self.to_table().write(plugin_name, *args, **kwargs)
+        headers, rows, types, widened = self._execute()
+        return plugin.iter_write(self.table._like(headers), rows, *args,
+                                 **kwargs)
+
 
 class Table(object):
     def __init__(self, headers=None, dash='-', pipe='|', plus='+',
-                 input_encoding='utf8', output_encoding='utf8'):
+                 input_encoding='utf8', output_encoding='utf8', types=None,
+                 track_types=False, columnar=False, max_memory=None):
         self.headers = headers if headers is not None else []
         for header in self.headers:
             if not isinstance(header, (str, unicode)):
@@ -64,24 +1517,74 @@ class Table(object):
         self.input_encoding = input_encoding
         self.output_encoding = output_encoding
         self.csv_filename = None
+        self.columnar = columnar
+        self.max_memory = _bytes(max_memory)
+        if columnar and self.max_memory is not None:
+            raise ValueError("Columnar tables can't use max_memory.")
+        self._row_type = None
         self._rows = []
-        self.types = {}
+        self.schema = _schema(types, input_encoding)
+        self.types = dict(self.schema)
+        self.parse_caches = {}
+        self.track_types = track_types
+        self._tracker = None
         self.plugins = {}
 
+    @property
+    def _rows(self):
+        return self._storage
+
+    @_rows.setter
+    def _rows(self, rows):
+        if self.columnar:
+            if not isinstance(rows, _Columns):
+                rows = _Columns(rows)
+        elif self.max_memory is not None:
+            if not isinstance(rows, _SpilledRows):
+                rows = _SpilledRows(self.max_memory, rows)
+        elif not isinstance(rows, list):
+            rows = list(rows)
+        self._storage = rows
+
+    def _column(self, index):
+        """Return the values of column ``index`` (if ``self.columnar`` it is
+        the stored ``list``, so it must not be changed)."""
+        if not isinstance(self._rows, list):
+            return self._rows.column(index)
+        return [row[index] for row in self._rows]
+
+    def _set_column(self, index, values):
+        """Replace the values of column ``index``."""
+        if not isinstance(self._rows, list):
+            self._rows.set_column(index, values)
+        else:
+            for row, value in izip(self._rows, values):
+                row[index] = value
+        self._tracker = None
+
+    def __iter__(self):
+        return iter(self._rows)
+
     def __setitem__(self, item, value):
         if isinstance(item, (str, unicode)):
             if item not in self.headers:
                 self.append_column(item, value)
-            columns = zip(*self._rows)
-            if not columns or len(value) != len(self):
+            if not len(self._rows) or len(value) != len(self):
                 raise ValueError
             else:
-                columns[self.headers.index(item)] = value
-                self._rows = [list(x) for x in zip(*columns)]
+                self._set_column(self.headers.index(item), value)
         elif isinstance(item, int):
-            self._rows[item] = self._prepare_to_append(value)
+            row = self._prepare_to_append(value)
+            tracker = self._tracked()
+            old_rows = [self._rows[item]] if tracker is not None else []
+            self._rows[item] = row
+            self._track(tracker, old_rows, [row])
         elif isinstance(item, slice):
-            self._rows[item] = [self._prepare_to_append(v) for v in value]
+            rows = [self._prepare_to_append(v) for v in value]
+            tracker = self._tracked()
+            old_rows = self._rows[item] if tracker is not None else []
+            self._rows[item] = rows
+            self._track(tracker, old_rows, rows)
         else:
             raise ValueError
 
@@ -89,11 +1592,7 @@ class Table(object):
         if isinstance(item, (str, unicode)):
             if item not in self.headers:
                 raise KeyError
-            columns = zip(*self._rows)
-            if not columns:
-                return []
-            else:
-                return list(columns[self.headers.index(item)])
+            return list(self._column(self.headers.index(item)))
         elif isinstance(item, (int, slice)):
             return self._rows[item]
         else:
@@ -101,46 +1600,114 @@ class Table(object):
 
     def __delitem__(self, item):
         if isinstance(item, (str, unicode)):
-            columns = zip(*self._rows)
             header_index = self.headers.index(item)
-            del columns[header_index]
+            if not isinstance(self._rows, list):
+                self._rows.delete_column(header_index)
+            else:
+                for row in self._rows:
+                    del row[header_index]
             del self.headers[header_index]
-            self._rows = [list(row) for row in zip(*columns)]
+            self._tracker = None
         elif isinstance(item, (int, slice)):
+            tracker = self._tracked()
+            old_rows = []
+            if tracker is not None:
+                old_rows = self._rows[item]
+                if isinstance(item, int):
+                    old_rows = [old_rows]
             del self._rows[item]
+            self._track(tracker, old_rows)
         else:
             raise ValueError
 
-    def order_by(self, column, ordering='asc'):
-        index = self.headers.index(column)
-        if ordering.lower().startswith('desc'):
-            sort_function = lambda x, y: cmp(y[index], x[index])
+    def order_by(self, column, ordering='asc', nulls=None, external=False,
+                 run_size=None):
+        """Sort the rows by ``column`` (a header) or by a list of headers
+        and/or ``(header, ordering)`` tuples, the first ones taking
+        precedence (e.g. ``[('state', 'asc'), ('population', 'desc')]``).
+        ``ordering`` is used for headers without one. The sort is stable.
+
+        ``None`` values come before the others (so first in ascending and
+        last in descending order) unless ``nulls`` is ``'first'`` or
+        ``'last'``.
+
+        If ``external`` is ``True`` runs of ``run_size`` rows (default
+        ``SORT_RUN_ROWS``) are sorted, stored in a temporary file and
+        merged (see ``_external_sorted``), so only one run is sorted in
+        memory at a time (combine with ``max_memory`` to store the result
+        out of memory too, or use ``Scan.order_by`` to write it directly).
+        Columnar tables keep the storage of their columns (only the row
+        indexes are sorted externally).
+        """
+        if nulls not in (None, 'first', 'last'):
+            raise ValueError('Invalid nulls: {}'.format(nulls))
+        columns = _sort_columns(self.headers, column, ordering,
+                                self.input_encoding)
+        if external:
+            key = _row_key(columns, nulls)
+            if isinstance(self._rows, _Columns):
+                # Sort the row indexes, so each column keeps its storage
+                rows = _external_sorted(enumerate(self._rows),
+                                        lambda item: key(item[1]), run_size)
+                self._rows.reorder([index for index, row in rows])
+            else:
+                rows = _external_sorted(self._rows, key, run_size)
+                first = next(rows, None)
+                # The runs are stored: release the rows before merging them
+                self._rows = []
+                if first is not None:
+                    self._rows = chain([first], rows)
+            return
+        passes = []
+        for index, descending in columns:
+            if passes and passes[-1][1] == descending:
+                passes[-1][0].append(index)
+            else:
+                passes.append(([index], descending))
+        # Each pass sorts by consecutive columns with the same ordering;
+        # as the sort is stable, the last pass has precedence.
+        for indexes, descending in reversed(passes):
+            none_high = nulls is not None and \
+                        (nulls == 'first') == descending
+            self._sort_pass(indexes, descending, none_high)
+
+    def _sort_pass(self, indexes, descending, none_high):
+        columns = [self._column(index) for index in indexes]
+        if len(columns) == 1 and isinstance(columns[0], _DictionaryColumn):
+            ranks = columns[0].ranks(_null_key(none_high))
+            codes = columns[0].codes
+            order = sorted(xrange(len(codes)),
+                           key=lambda row: ranks[codes[row]],
+                           reverse=descending)
+            self._rows.reorder(order)
+            return
+        if not any(None in column for column in columns):
+            key = operator.itemgetter(*indexes)
         else:
-            sort_function = lambda x, y: cmp(x[index], y[index])
-        self._rows.sort(sort_function)
+            value_key = _null_key(none_high)
+            getters = [operator.itemgetter(index) for index in indexes]
+            key = lambda row: [value_key(getter(row)) for getter in getters]
+        self._rows.sort(key=key, reverse=descending)
 
     def encode(self, codec=None):
         if codec is None:
             codec = self.output_encoding
         self.headers = [_unicode_encode(x, codec) for x in self.headers]
-        rows = []
-        for row in self._rows:
-            rows.append([_unicode_encode(value, codec) for value in row])
-        self._rows = rows
+        self._rows = ([_unicode_encode(value, codec) for value in row]
+                      for row in self._rows)
 
     def decode(self, codec=None):
         if codec is None:
             codec = self.input_encoding
-        rows = []
-        for row in self._rows:
-            rows.append([_str_decode(v, codec) for v in row])
-        self._rows = rows
+        self._rows = ([_str_decode(v, codec) for v in row]
+                      for row in self._rows)
         self.headers = [_str_decode(h, codec) for h in self.headers]
 
     def _max_column_sizes(self):
         max_size = {}
         for column in self.headers:
-            sizes = [len(unicode(value)) for value in self[column]]
+            values = self._column(self.headers.index(column))
+            sizes = [len(unicode(value)) for value in values]
             max_column_size = max(sizes + [len(column)])
             max_size[column] = max_column_size
         return max_size
@@ -176,111 +1743,176 @@ class Table(object):
     def __str__(self):
         return self.__unicode__().encode(self.output_encoding)
 
+    def _row_class(self):
+        headers = tuple(self.headers)
+        if self._row_type is None or self._row_type._headers != headers:
+            index = {header: position
+                     for position, header in enumerate(headers)}
+            self._row_type = type('Row', (Row,), {'__slots__': (),
+                                                  '_headers': headers,
+                                                  '_index': index})
+        return self._row_type
+
+    def iter_rows(self):
+        """Iterate over the rows as ``Row`` objects (values can be accessed
+        by position or header), without encoding the table or creating a
+        ``dict`` per row (as ``to_list_of_dicts`` does)."""
+        row_class = self._row_class()
+        return (row_class(row) for row in self._rows)
+
     def to_list_of_dicts(self, encoding=''):
-        if encoding is not None:
-            self.encode(encoding or self.output_encoding)
-        rows = [dict(zip(self.headers, row)) for row in self._rows]
-        if encoding is not None:
-            self.decode(encoding or self.output_encoding)
-        return rows
-
-    def _identify_type_of_data(self):
+        if encoding is None:
+            return [dict(zip(self.headers, row)) for row in self._rows]
+        codec = encoding or self.output_encoding
+        headers = [_unicode_encode(header, codec) for header in self.headers]
+        return [dict(zip(headers, [_unicode_encode(value, codec)
+                                   for value in row]))
+                for row in self._rows]
+
+    def _tracked(self):
+        """Return the ``_TypeTracker`` of ``self._rows`` (counting the rows
+        appended directly to it) if ``self.track_types`` is ``True``."""
+        if not self.track_types:
+            return None
+        tracker = self._tracker
+        if tracker is None or tracker.rows is not self._rows or \
+           tracker.tracked > len(self._rows) or \
+           len(tracker.cant_be) != len(self.headers):
+            tracker = self._tracker = _TypeTracker(self._rows,
+                                                   len(self.headers))
+        else:
+            tracker.update()
+        return tracker
+
+    def _track(self, tracker, removed=(), added=()):
+        """Count ``removed`` and ``added`` rows in ``tracker`` (if not
+        ``None``) and update ``self.types``."""
+        if tracker is None:
+            return
+        for row in removed:
+            tracker.count(row, -1)
+        for row in added:
+            tracker.count(row, 1)
+        for header, type_ in zip(self.headers, tracker.types()):
+            self.types[header] = self.schema.get(header, type_)
+
+    def _identify_type_of_data(self, numpy=False):
         """Create ``self.types``, a ``dict`` in which each key is a table
         header (from ``self.headers``) and value is a type in:
         ``(int, float, datetime.date, datetime.datetime, str)``.
 
         The types are identified trying to convert each column value to each
-        type.
+        type (using NumPy on whole columns if ``numpy`` is ``True``), except
+        for columns declared in ``self.schema``.
         """
-        columns = zip(*self._rows)
-        for i, header in enumerate(self.headers):
-            column_types = [int, float, datetime.date, datetime.datetime, str]
-            cant_be = set()
-            try:
-                column = columns[i]
-            except IndexError:
+        if self.track_types and not numpy:
+            self._track(self._tracked())
+            return
+        if numpy:
+            from outputty.vectorized import normalize
+            for index, header in enumerate(self.headers):
+                if header in self.schema:
+                    self.types[header] = self.schema[header]
+                    continue
+                column = self._column(index)
+                self.types[header] = normalize(column,
+                                               self.input_encoding)[0]
+            return
+        for index, header in enumerate(self.headers):
+            if header in self.schema:
+                self.types[header] = self.schema[header]
+            elif not len(self._rows):
                 self.types[header] = str
             else:
-                types = list(set([type(value) for value in column]) -
-                             set([type(None)]))
-                if len(types) == 1 and types[0] not in (str, unicode):
-                    self.types[header] = types[0]
-                    continue
-                for value in column:
-                    if value == '':
-                        value = None
-                    try:
-                        converted = int(value)
-                        if str(converted) != str(value):
-                            raise ValueError('It is float')
-                    except ValueError:
-                        cant_be.add(int)
-                    except TypeError:
-                        pass  # None should pass
-                    try:
-                        converted = float(value)
-                    except ValueError:
-                        cant_be.add(float)
-                    except TypeError:
-                        pass  # None should pass
-                    if value is not None:
-                        if datetime_regex.match(unicode(value)) is None:
-                            cant_be.add(datetime.datetime)
-                        if date_regex.match(unicode(value)) is None:
-                            cant_be.add(datetime.date)
-                for removed_type in cant_be:
-                    column_types.remove(removed_type)
-                self.types[header] = column_types[0]
-
-    def normalize_types(self):
-        self._identify_type_of_data()
-        rows_converted = []
-        for row in self._rows:
-            row_data = []
-            for index, value in enumerate(row):
-                type_ = self.types[self.headers[index]]
-                if value is None or value == '':
-                    row_data.append(None)
-                elif type_ == datetime.date:
-                    info = [int(x) for x in value.split('-')]
-                    row_data.append(datetime.date(*info))
-                elif type_ == datetime.datetime:
-                    info = value.split()
-                    date = [int(x) for x in info[0].split('-')]
-                    rest = [int(x) for x in info[1].split(':')]
-                    row_data.append(datetime.datetime(*(date + rest)))
-                elif type_ == str:
-                    if isinstance(value, unicode):
-                        row_data.append(value)
-                    else:
-                        if not isinstance(value, str):
-                            value = str(value)
-                        row_data.append(value.decode(self.input_encoding))
-                else:
-                    row_data.append(type_(value))
-            rows_converted.append(row_data)
-        self._rows = rows_converted
+                column = self._column(index)
+                self.types[header] = _typed(column) or \
+                                     _best_type(_cant_be(column))
+
+    def normalize_types(self, sample=None, numpy=False, workers=None,
+                        cache=None, compact=False, dictionary=None):
+        """Identify the type of each column and convert all values to it
+        (see ``_normalize``). If ``numpy`` is ``True`` each column is
+        converted at once using NumPy arrays (see ``outputty.vectorized``).
+
+        If ``sample`` is not ``None`` the type of each column is identified
+        using only ``sample`` values (see ``_sample``) and tried first when
+        converting the whole column. If any value doesn't fit in it, the
+        type is identified again using all values, so the result is always
+        the same.
+
+        If ``workers`` is greater than 1, the columns are split in chunks
+        and normalized by a pool of ``workers`` processes.
+
+        Columns declared in ``self.schema`` are converted to the declared
+        type without identifying it (``ValueError`` is raised if a value
+        can't be converted).
+
+        If ``cache`` is not ``None``, repeated numbers, dates and datetimes
+        of each column are parsed only once, using a ``ParseCache`` of
+        ``cache`` values; the statistics of each column are stored in
+        ``self.parse_caches`` (a ``dict``, keyed by header).
+
+        If ``compact`` is ``True`` the table becomes columnar (see
+        ``_Columns``) and ``int``, ``float``, ``datetime.date`` and
+        ``datetime.datetime`` columns are stored in arrays (see
+        ``_TypedColumn``), using less memory (not available with
+        ``max_memory``, the same for ``dictionary``).
+
+        If ``dictionary`` is not ``None`` the table becomes columnar and
+        ``str`` columns with at most ``dictionary`` distinct values are
+        dictionary-encoded (see ``_DictionaryColumn``): each distinct value
+        is stored once and ``order_by``, ``count`` and the CSV writer work
+        on its codes.
+        """
+        if (compact or dictionary is not None) and not self.columnar:
+            if self.max_memory is not None:
+                raise ValueError("Tables using max_memory can't be "
+                                 "columnar.")
+            self.columnar = True
+            self._rows = self._rows
+        number_of_columns = len(self.headers)
+        jobs = ((self._column(index), self.input_encoding,
+                 sample, numpy, cache, self.schema.get(header))
+                for index, header in enumerate(self.headers))
+        if workers > 1 and number_of_columns > 1:
+            chunk_size = -(-number_of_columns // workers)
+            pool = multiprocessing.Pool(workers)
+            try:
+                results = pool.map(_normalize_column, list(jobs), chunk_size)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = (_normalize_column(job) for job in jobs)
+        self.parse_caches = {}
+        self._tracker = None
+        for index, (type_, values, parse_cache) in enumerate(results):
+            header = self.headers[index]
+            self.types[header] = type_
+            if parse_cache is not None:
+                self.parse_caches[header] = parse_cache
+            if compact:
+                values = _compact(type_, values)
+            if dictionary is not None and type_ is str:
+                values = _dictionary(values, dictionary)
+            self._set_column(index, values)
 
     def to_dict(self, only=None, key=None, value=None):
-        self.encode()
+        codec = self.output_encoding
+        encoded = lambda index: [_unicode_encode(value, codec)
+                                 for value in self._column(index)]
         table_dict = {}
         if key is not None and value is not None:
-            if isinstance(key, str):
-                key = key.decode(self.input_encoding)
-            key = key.encode(self.output_encoding)
-            if isinstance(value, str):
-                value = value.decode(self.input_encoding)
-            value = value.encode(self.output_encoding)
-            key_index = self.headers.index(key)
-            value_index = self.headers.index(value)
-            for row in self._rows:
-                table_dict[row[key_index]] = row[value_index]
-        else:
-            for index, column in enumerate(zip(*self._rows)):
-                header_name = self.headers[index]
+            key_index = self.headers.index(_str_decode(key,
+                                                       self.input_encoding))
+            value_index = self.headers.index(_str_decode(value,
+                                                         self.input_encoding))
+            table_dict = dict(izip(encoded(key_index), encoded(value_index)))
+        elif len(self._rows):
+            for index, header in enumerate(self.headers):
+                header_name = _unicode_encode(header, codec)
                 if only is None or header_name in only:
-                    table_dict[header_name] = list(column)
-        self.decode(self.output_encoding)
+                    table_dict[header_name] = encoded(index)
         return table_dict
 
     def _load_plugin(self, plugin_name):
@@ -294,6 +1926,30 @@ class Table(object):
         plugin = self._load_plugin(plugin_name)
         return plugin.read(self, *args, **kwargs)
 
+    def _like(self, headers=None):
+        """Return an empty ``Table`` with the settings of this one."""
+        return Table(headers=headers, dash=self.dash, pipe=self.pipe,
+                     plus=self.plus, input_encoding=self.input_encoding,
+                     output_encoding=self.output_encoding, types=self.schema,
+                     columnar=self.columnar, max_memory=self.max_memory)
+
+    def scan(self, plugin_name, *args, **kwargs):
+        """Return a lazy query (``Scan``) reading data using plugin
+        ``plugin_name`` (using ``iter_read``, if the plugin has it) into
+        tables with the settings of this one. For example:
+        ``table.scan('csv', 'data.csv').filter(('age', '>', 18))
+        .select(['name']).order_by('name').write('csv', 'adults.csv')``.
+        """
+        return Scan(self, plugin_name, args, kwargs)
+
+    def iter_read(self, plugin_name, *args, **kwargs):
+        """Read data using plugin ``plugin_name`` incrementally. Returns an
+        iterator of ``Table`` objects (chunks of rows), so the whole resource
+        doesn't need to fit in memory.
+        """
+        plugin = self._load_plugin(plugin_name)
+        return plugin.iter_read(self, *args, **kwargs)
+
     def write(self, plugin_name, *args, **kwargs):
         plugin = self._load_plugin(plugin_name)
         return plugin.write(self, *args, **kwargs)
@@ -301,6 +1957,8 @@ class Table(object):
     def append(self, item):
         item = self._prepare_to_append(item)
         self._rows.append(item)
+        if self.track_types:
+            self._track(self._tracked())
 
     def _prepare_to_append(self, item):
         if isinstance(item, dict):
@@ -361,19 +2019,28 @@ class Table(object):
         """Insert ``row`` in the position ``index``. Same as ``list.insert``.
         ``row`` can be ``list``, ``tuple`` or ``dict``.
         """
-        self._rows.insert(index, self._prepare_to_append(row))
+        row = self._prepare_to_append(row)
+        tracker = self._tracked()
+        self._rows.insert(index, row)
+        self._track(tracker, added=[row])
 
     def pop(self, index=-1):
         """Removes and returns row in position ``index``. ``index`` defaults
         to -1. Same as ``list.pop``.
         """
-        return self._rows.pop(index)
+        tracker = self._tracked()
+        row = self._rows.pop(index)
+        self._track(tracker, [row])
+        return row
 
     def remove(self, row):
         """Removes first occurrence of ``row``. Raises ``ValueError`` if
         ``row`` is not found. Same as ``list.remove``.
         """
-        self._rows.remove(self._prepare_to_append(row))
+        row = self._prepare_to_append(row)
+        tracker = self._tracked()
+        self._rows.remove(row)
+        self._track(tracker, [row])
 
     def reverse(self):
         """Reverse the order of rows *in place* (does not return a new
@@ -390,20 +2057,18 @@ class Table(object):
            name in self.headers:
             raise ValueError
         if position is None:
-            insert_header = lambda name: self.headers.append(name)
-            insert_data = lambda row, value: row.append(value)
-        else:
-            insert_header = lambda name: self.headers.insert(position, name)
-            insert_data = lambda row, value: row.insert(position, value)
-        for index, row in enumerate(self):
-            if type(values) == types.FunctionType:
-                if row_as_dict:
-                    value = values({header: row[index] \
-                                    for index, header in \
-                                        enumerate(self.headers)})
-                else:
-                    value = values(row)
+            position = len(self.headers)
+        if type(values) == types.FunctionType:
+            if row_as_dict:
+                values = [values(dict(zip(self.headers, row)))
+                          for row in self]
             else:
-                value = values[index]
-            insert_data(row, _str_decode(value, self.input_encoding))
-        insert_header(name)
+                values = [values(row) for row in self]
+        values = [_str_decode(value, self.input_encoding) for value in values]
+        if not isinstance(self._rows, list):
+            self._rows.insert_column(position, values)
+        else:
+            for row, value in izip(self._rows, values):
+                row.insert(position, value)
+        self.headers.insert(position, name)
+        self._tracker = None
@@ -1,65 +1,671 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import bz2
+import codecs
 import csv
-from StringIO import StringIO
+import glob
+import itertools
+import mmap
+import multiprocessing
+import os
+import zlib
+from cStringIO import StringIO
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+from outputty import (Table, _DictionaryColumn, _best_type, _cant_be,
+                      _converter, _predicate, _schema, _str_decode)
 
 
 DELIMITER = ','
 QUOTE_CHAR = '"'
 LINE_TERMINATOR = '\n'
+BLOCK_SIZE = 2 ** 20
+CHUNK_ROWS = 10000
+BYTE_ENCODINGS = ('ascii', 'utf-8', 'iso8859-1', 'cp1252')
 
 class MyCSV(csv.Dialect):
     doublequote = True
     skipinitialspace = False
     quoting = csv.QUOTE_ALL
 
-def read(table, file_name_or_pointer, convert_types=True, delimiter=DELIMITER,
-         quote_char=QUOTE_CHAR, line_terminator=LINE_TERMINATOR):
-    MyCSV.delimiter = delimiter
-    MyCSV.quotechar = quote_char
-    MyCSV.lineterminator = line_terminator
-    table.convert_types = convert_types
+def _dialect(delimiter, quote_char, line_terminator):
+    """Create a new dialect (based on ``MyCSV``) for each call, so reading
+    and writing with different options at the same time is safe."""
+    class Dialect(MyCSV):
+        pass
+    Dialect.delimiter = delimiter
+    Dialect.quotechar = quote_char
+    Dialect.lineterminator = line_terminator
+    return Dialect
+
+def _lines(fp, encoding):
+    """Decode ``fp`` in blocks of ``BLOCK_SIZE`` bytes and yield its lines
+    encoded in UTF-8 (``csv`` module does not accept ``unicode``)."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    remaining = u''
+    while True:
+        data = fp.read(BLOCK_SIZE)
+        text = remaining + decoder.decode(data, final=not data)
+        end = text.rfind(u'\n') + 1
+        remaining = text[end:]
+        for line in text[:end].encode('utf8').split('\n')[:-1]:
+            yield line + '\n'
+        if not data:
+            break
+    if remaining:
+        yield remaining.encode('utf8')
+
+def _mapped_lines(mapped, start, end):
+    mapped.seek(start)
+    readline = mapped.readline
+    while mapped.tell() < end:
+        yield readline()
+
+def _csv_rows(lines, dialect):
+    for row in csv.reader(lines, dialect=dialect):
+        if row:
+            yield row
+
+def _decode(row, codec, indexes=None):
+    if indexes is not None:
+        try:
+            row = [row[index] for index in indexes]
+        except IndexError:
+            raise ValueError
+    return [unicode(value, codec) for value in row]
+
+def _gzip_decompressor():
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+def _gzip_compressor():
+    return zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+def _lzma(name):
+    def create():
+        if lzma is None:
+            raise ImportError('lzma (or backports.lzma) is needed to use xz')
+        return getattr(lzma, name)()
+    return create
+
+COMPRESSIONS = {'gz': ('\x1f\x8b', _gzip_decompressor, _gzip_compressor),
+                'bz2': ('BZh', bz2.BZ2Decompressor, bz2.BZ2Compressor),
+                'xz': ('\xfd7zXZ\x00', _lzma('LZMADecompressor'),
+                       _lzma('LZMACompressor'))}
+
+class _Decompressed(object):
+    def __init__(self, fp, compression):
+        self.fp = fp
+        self.new_decompressor = COMPRESSIONS[compression][1]
+        self.decompressor = self.new_decompressor()
+        self.buffer = ''
+        self.position = 0
+        self.finished = False
+
+    def read(self, size):
+        if len(self.buffer) - self.position < size:
+            buffer_ = self.buffer[self.position:]
+            while len(buffer_) < size and not self.finished:
+                data = self.fp.read(BLOCK_SIZE)
+                if data:
+                    buffer_ += self._decompress(data)
+                else:
+                    self.finished = True
+                    if hasattr(self.decompressor, 'flush'):
+                        buffer_ += self.decompressor.flush()
+            self.buffer, self.position = buffer_, 0
+        data = self.buffer[self.position:self.position + size]
+        self.position += len(data)
+        return data
+
+    def _decompress(self, data):
+        """Decompress ``data``, starting a new decompressor after the end of
+        each gzip member or bz2/xz stream (concatenated files)."""
+        result = []
+        while data:
+            try:
+                result.append(self.decompressor.decompress(data))
+            except EOFError:  # stream already finished (bz2 and xz)
+                self.decompressor = self.new_decompressor()
+                continue
+            data = getattr(self.decompressor, 'unused_data', '')
+            if data:
+                self.decompressor = self.new_decompressor()
+        return ''.join(result)
+
+    def close(self):
+        self.fp.close()
+
+class _Compressed(object):
+    def __init__(self, fp, compression):
+        self.fp = fp
+        self.compressor = COMPRESSIONS[compression][2]()
+
+    def write(self, data):
+        self.fp.write(self.compressor.compress(data))
+
+    def finish(self):
+        self.fp.write(self.compressor.flush())
+
+def _compression_from_name(filename):
+    extension = os.path.splitext(filename)[1][1:].lower()
+    return extension if extension in COMPRESSIONS else None
+
+def _detect_compression(fp):
+    try:
+        position = fp.tell()
+        header = fp.read(6)
+        fp.seek(position)
+    except (AttributeError, IOError):
+        return None  # not seekable
+    for compression, (magic, _, _) in COMPRESSIONS.items():
+        if header.startswith(magic):
+            return compression
+    return None
+
+def _open(file_name_or_pointer, compression=None, table=None):
+    """Return ``(fp, close)``. If ``compression`` is ``None`` it's detected
+    using the file extension or its first bytes; compressed files are
+    decompressed on the fly."""
     if isinstance(file_name_or_pointer, (str, unicode)):
-        table.csv_filename = file_name_or_pointer
-        fp = open(file_name_or_pointer, 'r')
+        if table is not None:
+            table.csv_filename = file_name_or_pointer
+        compression = compression or \
+                      _compression_from_name(file_name_or_pointer)
+        fp, close = open(file_name_or_pointer, 'rb'), True
     else:
-        fp = file_name_or_pointer
-    info = fp.read().decode(table.input_encoding).encode('utf8')
-    reader = csv.reader(info.split('\n'), dialect=MyCSV)
-    table.data = [x for x in reader if x]
-    if table.csv_filename:
+        fp, close = file_name_or_pointer, False
+    compression = compression or _detect_compression(fp)
+    if compression is not None:
+        fp = _Decompressed(fp, compression)
+    return fp, close
+
+class _FileRange(object):
+    def __init__(self, fp, start, end):
+        fp.seek(start)
+        self.fp = fp
+        self.remaining = end - start
+
+    def read(self, size):
+        data = self.fp.read(min(size, self.remaining))
+        self.remaining -= len(data)
+        return data
+
+def _mapped_rows(fp, dialect, start, end, encoding):
+    if start >= end:
+        return  # mmap can't map empty files
+    mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if encoding is None:
+            lines = _mapped_lines(mapped, start, end)
+        else:
+            lines = _lines(_FileRange(mapped, start, end), encoding)
+        for row in _csv_rows(lines, dialect):
+            yield row
+    finally:
+        mapped.close()
+
+def _read_rows(fp, encoding, dialect, use_mmap=False, start=None, end=None):
+    """Return ``(rows, codec)``: ``rows`` yields the rows (lists of fields
+    not decoded yet, in ``codec``) of ``fp`` from byte ``start`` (defaults to
+    current position) to ``end`` (defaults to end of file).
+    If ``use_mmap`` is ``True`` and ``fp`` is a real file it is memory-mapped
+    and, for encodings in ``BYTE_ENCODINGS``, lines are parsed straight from
+    the mapped buffer."""
+    if use_mmap and hasattr(fp, 'fileno'):
+        if start is None:
+            start = fp.tell()
+        if end is None:
+            end = os.fstat(fp.fileno()).st_size
+        codec = codecs.lookup(encoding).name
+        if codec in BYTE_ENCODINGS:
+            return _mapped_rows(fp, dialect, start, end, None), codec
+        else:
+            return _mapped_rows(fp, dialect, start, end, encoding), 'utf-8'
+    if end is not None:
+        fp = _FileRange(fp, start, end)
+    return _csv_rows(_lines(fp, encoding), dialect), 'utf-8'
+
+def _read_headers(table, rows, codec, columns):
+    """Set ``table.headers`` from the first row (only ``columns``, if not
+    ``None``) and return all the headers and the indexes of ``columns``."""
+    headers = table.headers = _decode(next(rows, []), codec)
+    if columns is None or not headers:
+        return headers, None
+    indexes = [headers.index(_str_decode(column, table.input_encoding))
+               for column in columns]
+    table.headers = [headers[index] for index in indexes]
+    return headers, indexes
+
+def _selected_rows(rows, codec, headers, indexes, where, encoding):
+    if where is None:
+        for row in rows:
+            yield _decode(row, codec, indexes)
+        return
+    accept = _predicate(where, headers, encoding)
+    for row in rows:
+        row = _decode(row, codec)
+        if len(row) != len(headers):
+            raise ValueError
+        if accept(row):
+            if indexes is not None:
+                row = [row[index] for index in indexes]
+            yield row
+
+def _checked_rows(rows, columns):
+    """Return a list with ``rows`` (already decoded, so they can be stored
+    directly in ``Table._rows``), raising ``ValueError`` if any of them
+    hasn't ``columns`` fields."""
+    result = []
+    append = result.append
+    for row in rows:
+        if len(row) != columns:
+            raise ValueError
+        append(row)
+    return result
+
+def _checking_rows(rows, columns):
+    """Same as ``_checked_rows``, but yield the rows (so the rows before an
+    invalid one are already stored when ``ValueError`` is raised)."""
+    for row in rows:
+        if len(row) != columns:
+            raise ValueError
+        yield row
+
+def _splittable(encoding, quote_char):
+    characters = '\n' + quote_char
+    try:
+        return characters.decode('ascii').encode(encoding) == characters
+    except UnicodeError:
+        return False
+
+def _record_offsets(fp, quote_char, size, parts):
+    """Return the offsets (in bytes) where each of (at most) ``parts``
+    ranges of ``fp`` starts. An offset is always right after a line break
+    preceded by an even number of ``quote_char``, so it is never inside a
+    quoted field."""
+    offsets = [0]
+    position = quotes = 0
+    fp.seek(0)
+    for part in range(1, parts):
+        target = size * part // parts
+        while position < target:
+            data = fp.read(min(BLOCK_SIZE, target - position))
+            quotes += data.count(quote_char)
+            position += len(data)
+        boundary = None
+        while boundary is None:
+            data = fp.read(BLOCK_SIZE)
+            if not data:
+                return offsets
+            start = 0
+            while boundary is None:
+                index = data.find('\n', start)
+                if index == -1:
+                    quotes += data.count(quote_char, start)
+                    position += len(data)
+                    break
+                quotes += data.count(quote_char, start, index)
+                start = index + 1
+                if quotes % 2 == 0:
+                    boundary = position + start
+        if boundary >= size:
+            break
+        position = boundary
+        fp.seek(position)
+        offsets.append(position)
+    return offsets
+
+def _filenames(file_name_or_pointer):
+    """Return the list of filenames to read if ``file_name_or_pointer`` is a
+    list/tuple of filenames or a glob pattern, else ``None``."""
+    if isinstance(file_name_or_pointer, (list, tuple)):
+        return list(file_name_or_pointer)
+    elif isinstance(file_name_or_pointer, (str, unicode)) and \
+         not os.path.exists(file_name_or_pointer) and \
+         any(char in file_name_or_pointer for char in '*?['):
+        return sorted(glob.glob(file_name_or_pointer)) or \
+               [file_name_or_pointer]
+    return None
+
+def _check_headers(headers, other_headers, filename):
+    if headers is not None and headers != other_headers:
+        raise ValueError('Headers of {} are different.'.format(filename))
+    return other_headers
+
+def _read_range(job):
+    dialect = _dialect(*job['options'])
+    fp, close = _open(job['filename'], job['compression'])
+    rows, codec = _read_rows(fp, job['encoding'], dialect, job['mmap'],
+                             job['start'], job['end'])
+    if job['skip_header']:
+        next(rows, None)
+    result = _checked_rows(_selected_rows(rows, codec, job['headers'],
+                                          job['indexes'], job['where'],
+                                          job['encoding']),
+                           job['columns'])
+    if close:
         fp.close()
-    table.headers = []
-    if table.data:
-        table.headers = [x.decode('utf8') for x in table.data[0]]
-        table.extend([[y.decode('utf8') for y in x] for x in table.data[1:]])
-        if table.convert_types:
-            table.normalize_types()
+    return result
 
-def write(table, filename_or_pointer=None, delimiter=DELIMITER,
-          quote_char=QUOTE_CHAR, line_terminator=LINE_TERMINATOR):
-    MyCSV.delimiter = delimiter
-    MyCSV.quotechar = quote_char
-    MyCSV.lineterminator = line_terminator
-    table.decode()
-    table.encode()
-    if filename_or_pointer is not None:
-        if isinstance(filename_or_pointer, (str, unicode)):
-            fp = open(filename_or_pointer, 'w')
-            close = True
+def _identify_range(job):
+    rows = _read_range(job)
+    return len(rows), [_cant_be(column) for column in zip(*rows)]
+
+def _convert_range(job_and_types):
+    job, types = job_and_types
+    converters = [_converter(type_, job['encoding']) for type_ in types]
+    return [[convert(value) for convert, value in zip(converters, row)]
+            for row in _read_range(job)]
+
+def _parallel_read(table, filenames, workers, convert_types, columns, where,
+                   options, use_mmap, compression):
+    split = len(filenames) == 1 and \
+            _splittable(table.input_encoding, options[1])
+    dialect = _dialect(*options)
+    headers = None
+    ranges = []
+    for filename in filenames:
+        table.csv_filename = filename
+        fp, close = _open(filename, compression)
+        rows, codec = _read_rows(fp, table.input_encoding, dialect)
+        file_headers, indexes = _read_headers(table, rows, codec, columns)
+        headers = _check_headers(headers, file_headers, filename)
+        if isinstance(fp, _Decompressed):
+            ranges.append((filename, 0, None, True))
+        else:
+            size = os.path.getsize(filename)
+            offsets = [0]
+            if split:
+                offsets = _record_offsets(fp, options[1], size, workers)
+            for index, (start, end) in enumerate(zip(offsets,
+                                                     offsets[1:] + [size])):
+                ranges.append((filename, start, end, index == 0))
+        fp.close()
+    if not table.headers:
+        return
+    number_of_columns = len(table.headers)
+    jobs = [{'filename': filename, 'start': start, 'end': end,
+             'skip_header': skip_header, 'encoding': table.input_encoding,
+             'options': options, 'headers': headers, 'indexes': indexes,
+             'where': where, 'columns': number_of_columns, 'mmap': use_mmap,
+             'compression': compression}
+            for filename, start, end, skip_header in ranges]
+    pool = multiprocessing.Pool(workers)
+    try:
+        if convert_types:
+            if all(header in table.schema for header in table.headers):
+                types = [table.schema[header] for header in table.headers]
+            else:
+                identified = pool.map(_identify_range, jobs)
+                cant_be = [set() for index in range(number_of_columns)]
+                for number_of_rows, columns_cant_be in identified:
+                    for index, types in enumerate(columns_cant_be):
+                        cant_be[index] |= types
+                if sum(number_of_rows for number_of_rows, _ in identified):
+                    types = [_best_type(column) for column in cant_be]
+                else:
+                    types = [str] * number_of_columns
+                types = [table.schema.get(header, type_)
+                         for header, type_ in zip(table.headers, types)]
+            table.types.update(zip(table.headers, types))
+            chunks = pool.map(_convert_range, [(job, types) for job in jobs])
+        else:
+            chunks = pool.map(_read_range, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    for rows in chunks:
+        table._rows.extend(rows)
+
+def _serial_read(table, files, convert_types, columns, where, dialect,
+                 use_mmap, compression, use_numpy, dictionary):
+    headers = None
+    for file_name_or_pointer in files:
+        fp, close = _open(file_name_or_pointer, compression, table)
+        try:
+            rows, codec = _read_rows(fp, table.input_encoding, dialect,
+                                     use_mmap)
+            file_headers, indexes = _read_headers(table, rows, codec, columns)
+            headers = _check_headers(headers, file_headers,
+                                     file_name_or_pointer)
+            check = _checked_rows if table.max_memory is None else \
+                    _checking_rows
+            table._rows.extend(check(
+                    _selected_rows(rows, codec, headers, indexes, where,
+                                   table.input_encoding),
+                    len(table.headers)))
+        finally:
+            if close:
+                fp.close()
+    if table.headers and convert_types:
+        table.normalize_types(numpy=use_numpy, dictionary=dictionary)
+
+def read(table, file_name_or_pointer, convert_types=True, delimiter=DELIMITER,
+         quote_char=QUOTE_CHAR, line_terminator=LINE_TERMINATOR,
+         workers=None, mmap=False, columns=None, where=None,
+         compression=None, numpy=False, types=None, dictionary=None):
+    """Read CSV data into ``table``. ``file_name_or_pointer`` can be a
+    filename, a file object, a list of filenames or a glob pattern (all the
+    files must have the same headers; their rows are concatenated).
+    If ``columns`` is a list of header names, only these columns are read
+    (in this order); other fields are not decoded, stored nor converted.
+    If ``where`` is not ``None`` only the rows matching it are stored (see
+    ``outputty._predicate``); it's evaluated before type conversion (when
+    using ``workers`` it must be picklable, so no ``lambda``).
+    If ``workers`` is greater than 1, the files are read by a pool of
+    ``workers`` processes (which also identify/convert types). A single
+    filename in an ASCII-compatible encoding is split in byte ranges to be
+    read in parallel.
+    If ``mmap`` is ``True`` the file is memory-mapped (by each worker, if
+    any) instead of being read through a buffer.
+    Compressed files (``compression`` in ``COMPRESSIONS``, detected using
+    the file extension or its first bytes if ``None``) are decompressed
+    on the fly.
+    If ``numpy`` is ``True`` types are converted using NumPy (see
+    ``Table.normalize_types``), except when reading with ``workers``; the
+    same for ``dictionary`` (text columns with at most ``dictionary``
+    distinct values are dictionary-encoded).
+    ``types`` (a ``dict`` mapping header to type) updates ``table.schema``:
+    these columns are converted without identifying their types."""
+    table.convert_types = convert_types
+    table.schema.update(_schema(types, table.input_encoding))
+    filenames = _filenames(file_name_or_pointer)
+    if workers > 1 and (filenames is not None or
+                        (isinstance(file_name_or_pointer, (str, unicode)) and
+                         _splittable(table.input_encoding, quote_char))):
+        options = (delimiter, quote_char, line_terminator)
+        _parallel_read(table, filenames or [file_name_or_pointer], workers,
+                       convert_types, columns, where, options, mmap,
+                       compression)
+    else:
+        if filenames is None:
+            filenames = [file_name_or_pointer]
+        dialect = _dialect(delimiter, quote_char, line_terminator)
+        _serial_read(table, filenames, convert_types, columns, where, dialect,
+                     mmap, compression, numpy, dictionary)
+
+def iter_read(table, file_name_or_pointer, chunk_rows=CHUNK_ROWS,
+              convert_types=True, delimiter=DELIMITER, quote_char=QUOTE_CHAR,
+              line_terminator=LINE_TERMINATOR, mmap=False, columns=None,
+              where=None, compression=None, numpy=False, types=None,
+              dictionary=None):
+    """Read the CSV incrementally, yielding a new ``Table`` (with the same
+    headers, encodings and schema of ``table``) for each ``chunk_rows``
+    rows, so the whole file is never in memory. Types are identified per
+    chunk (so they may differ between chunks), except the ones declared in
+    ``table.schema`` when each chunk is created."""
+    dialect = _dialect(delimiter, quote_char, line_terminator)
+    table.convert_types = convert_types
+    table.schema.update(_schema(types, table.input_encoding))
+    fp, close = _open(file_name_or_pointer, compression, table)
+    rows, codec = _read_rows(fp, table.input_encoding, dialect, mmap)
+    try:
+        headers, indexes = _read_headers(table, rows, codec, columns)
+        chunk = None
+        for row in _selected_rows(rows, codec, headers, indexes, where,
+                                  table.input_encoding):
+            if chunk is None:
+                chunk = Table(headers=table.headers, dash=table.dash,
+                              pipe=table.pipe, plus=table.plus,
+                              input_encoding=table.input_encoding,
+                              output_encoding=table.output_encoding,
+                              types=table.schema, columnar=table.columnar)
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                if convert_types:
+                    chunk.normalize_types(numpy=numpy, dictionary=dictionary)
+                yield chunk
+                chunk = None
+        if chunk is not None:
+            if convert_types:
+                chunk.normalize_types(numpy=numpy, dictionary=dictionary)
+            yield chunk
+    finally:
+        if close:
+            fp.close()
+
+def _encode_row(row, input_encoding, output_encoding):
+    encoded = []
+    for value in row:
+        if isinstance(value, unicode):
+            value = value.encode(output_encoding)
+        elif isinstance(value, str):
+            value = value.decode(input_encoding).encode(output_encoding)
+        encoded.append(value)
+    return encoded
+
+def _value_encoder(input_encoding, output_encoding):
+    """Return a function that encodes one value (like ``_encode_row``)."""
+    def encode(value):
+        if isinstance(value, unicode):
+            return value.encode(output_encoding)
+        elif isinstance(value, str):
+            return value.decode(input_encoding).encode(output_encoding)
+        return value
+    return encode
+
+def _encoded_rows(table, start, input_encoding, output_encoding):
+    """Return the rows of ``table`` from ``start`` on, encoded as they are
+    consumed. Rows of a columnar ``table`` are created from the columns:
+    each distinct value of a dictionary-encoded column is encoded only
+    once."""
+    encodings = input_encoding, output_encoding
+    if not table.columnar or not len(table):
+        rows = table if not start else table[start:]
+        return (_encode_row(row, *encodings) for row in rows)
+    encode = _value_encoder(*encodings)
+    columns = []
+    for column in table._rows.columns:
+        if isinstance(column, _DictionaryColumn):
+            values = _encode_row(column.values, *encodings)
+            columns.append(itertools.imap(values.__getitem__,
+                                          itertools.islice(column.codes,
+                                                           start, None)))
         else:
-            fp = filename_or_pointer
-            close = False
+            columns.append(itertools.imap(encode, itertools.islice(column,
+                                                                   start,
+                                                                   None)))
+    return itertools.izip(*columns)
+
+def _write_rows(fp, rows, dialect):
+    """Write ``rows`` (already encoded) to ``fp`` in blocks of at least
+    ``BLOCK_SIZE`` bytes."""
+    buffer_ = StringIO()
+    writer = csv.writer(buffer_, dialect=dialect)
+    for row in rows:
+        writer.writerow(row)
+        if buffer_.tell() >= BLOCK_SIZE:
+            fp.write(buffer_.getvalue())
+            buffer_.seek(0)
+            buffer_.truncate()
+    fp.write(buffer_.getvalue())
+
+def _rows_to_append(table, filename):
+    """Return how many rows of ``table`` are already in ``filename`` (written
+    by a previous ``write(..., mode='append')``) or ``None`` if the file must
+    be rewritten (not written yet, changed by others or ``table`` has less
+    rows than before)."""
+    if not hasattr(table, 'csv_written'):
+        table.csv_written = {}
+    written = table.csv_written.get(os.path.abspath(filename))
+    if written is None or not os.path.exists(filename):
+        return None
+    rows, size = written
+    if rows > len(table) or os.path.getsize(filename) != size:
+        return None
+    return rows
+
+def write(table, filename_or_pointer=None, delimiter=DELIMITER,
+          quote_char=QUOTE_CHAR, line_terminator=LINE_TERMINATOR,
+          compression=None, mode='write'):
+    """Write ``table`` as CSV to a filename or file object (or return the
+    contents if ``filename_or_pointer`` is ``None``). Data is compressed if
+    ``compression`` is in ``COMPRESSIONS`` (for filenames it is detected
+    using the extension).
+    If ``mode`` is ``'append'`` (only for not compressed filenames), only
+    the rows appended to ``table`` since the last ``'append'`` write to the
+    same file are written (the whole file is written the first time)."""
+    if mode not in ('write', 'append'):
+        raise ValueError('Invalid mode: {}'.format(mode))
+    encodings = table.input_encoding, table.output_encoding
+    rows = lambda written: _encoded_rows(table, written or 0, *encodings)
+    return _write(table, rows, filename_or_pointer,
+                  _dialect(delimiter, quote_char, line_terminator),
+                  compression, mode)
+
+def iter_write(table, rows, filename_or_pointer=None, delimiter=DELIMITER,
+               quote_char=QUOTE_CHAR, line_terminator=LINE_TERMINATOR,
+               compression=None):
+    """Same as ``write``, but write ``rows`` (any iterable, such as the rows
+    of ``Table.scan``) with the headers and encodings of ``table``. Each row
+    is encoded only when it's written."""
+    encodings = table.input_encoding, table.output_encoding
+    encoded = (_encode_row(row, *encodings) for row in rows)
+    return _write(table, lambda written: encoded, filename_or_pointer,
+                  _dialect(delimiter, quote_char, line_terminator),
+                  compression, 'write')
+
+def _write(table, rows, filename_or_pointer, dialect, compression, mode):
+    """Write the headers of ``table`` and ``rows(written)`` (the encoded
+    rows, after the first ``written`` ones if appending)."""
+    is_filename = isinstance(filename_or_pointer, (str, unicode))
+    if is_filename:
+        compression = compression or \
+                      _compression_from_name(filename_or_pointer)
+    written = None
+    if mode == 'append':
+        if not is_filename or compression is not None:
+            raise ValueError('Only not compressed files can be appended.')
+        written = _rows_to_append(table, filename_or_pointer)
+    if is_filename:
+        fp = open(filename_or_pointer, 'wb' if written is None else 'ab')
+        close = True
+    elif filename_or_pointer is not None:
+        fp = filename_or_pointer
+        close = False
     else:
         fp = StringIO()
-    writer = csv.writer(fp, dialect=MyCSV)
-    writer.writerow(table.headers)
-    writer.writerows(table)
-    table.decode(table.output_encoding)
+    output = fp if compression is None else _Compressed(fp, compression)
+    rows = rows(written)
+    if written is None:
+        headers = _encode_row(table.headers, table.input_encoding,
+                              table.output_encoding)
+        rows = itertools.chain([headers], rows)
+    _write_rows(output, rows, dialect)
+    if compression is not None:
+        output.finish()
     if filename_or_pointer is None:
         contents = fp.getvalue()
         fp.close()
         return contents
     elif close:
         fp.close()
+        if mode == 'append':
+            table.csv_written[os.path.abspath(filename_or_pointer)] = \
+                    (len(table), os.path.getsize(filename_or_pointer))
@@ -4,10 +4,13 @@
 import datetime
 from unicodedata import normalize
 import MySQLdb
+from outputty import _conditions, _predicate
 
 
 MYSQL_TYPE = {str: 'TEXT', int: 'INT', float: 'FLOAT', datetime.date: 'DATE',
               datetime.datetime: 'DATETIME'}
+SQL_OPERATORS = {'==': '=', '!=': '<>', '<': '<', '<=': '<=', '>': '>',
+                 '>=': '>=', 'in': 'IN'}
 MYSQLDB_TYPE = {getattr(MySQLdb.FIELD_TYPE, x): x \
                 for x in dir(MySQLdb.FIELD_TYPE) if not x.startswith('_')}
 MYSQLDB_TO_PYTHON = {'ENUM': str,
@@ -71,14 +74,52 @@ def _get_mysql_config(connection_str):
 def _connect_to_mysql(config):
     return MySQLdb.connect(**config)
 
-def read(table, connection_string, limit=None, order_by=None, query=''):
+def _quote(column):
+    return '`%s`' % column.replace('`', '``')
+
+def _select(columns):
+    if columns is None:
+        return 'SELECT *'
+    return 'SELECT ' + ', '.join([_quote(column) for column in columns])
+
+def _where(where, literal):
+    conditions = []
+    for column, operator_, value in _conditions(where):
+        if operator_ not in SQL_OPERATORS:
+            raise ValueError('Invalid operator: {}'.format(operator_))
+        column = _quote(column)
+        if value is None:
+            if operator_ not in ('==', '!='):
+                raise ValueError('Invalid operator: {}'.format(operator_))
+            null = 'IS NULL' if operator_ == '==' else 'IS NOT NULL'
+            conditions.append('{} {}'.format(column, null))
+        elif operator_ == 'in':
+            values = ', '.join([literal(item) for item in value]) or 'NULL'
+            conditions.append('{} IN ({})'.format(column, values))
+        else:
+            conditions.append('{} {} {}'.format(column,
+                                                SQL_OPERATORS[operator_],
+                                                literal(value)))
+    if not conditions:
+        return ''
+    return ' WHERE ' + ' AND '.join(conditions)
+
+def read(table, connection_string, limit=None, order_by=None, query='',
+         columns=None, where=None):
     config, table_name = _get_mysql_config(connection_string)
     connection = _connect_to_mysql(config)
     cursor = connection.cursor()
+    condition = ''
+    if where is not None and not callable(where):
+        condition = _where(where, connection.literal)
     if query:
-        sql = query
+        if columns is None and not condition:
+            sql = query
+        else:
+            sql = _select(columns) + ' FROM (' + query + ') AS query' + \
+                  condition
     else:
-        sql = 'SELECT * FROM ' + table_name
+        sql = _select(columns) + ' FROM ' + table_name + condition
         if limit is not None:
             sql += ' LIMIT {0[0]}, {0[1]}'.format(limit)
         if order_by is not None:
@@ -88,12 +129,17 @@ def read(table, connection_string, limit=None, order_by=None, query=''):
     table.headers = [x[0] for x in cursor.description]
     table.types = {name: MYSQLDB_TO_PYTHON[MYSQLDB_TYPE[type_]] \
                    for name, type_ in column_info}
-    table._rows = [list(row) for row in cursor.fetchall()]
     encoding = connection.character_set_name()
-    for row_index, row in enumerate(table):
-        for column_index, value in enumerate(row):
-            if type(value) is str:
-                table[row_index][column_index] = value.decode(encoding)
+    accept = None
+    if callable(where):
+        accept = _predicate(where, table.headers, encoding)
+    rows = []
+    for row in cursor:
+        row = [value.decode(encoding) if type(value) is str else value
+               for value in row]
+        if accept is None or accept(row):
+            rows.append(row)
+    table._rows = rows
     cursor.close()
     connection.close()
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import datetime
+import numpy
+from outputty import _convert, _normalize, _str_decode, _typed
+
+
+DATE_SEPARATORS = {4: u'-', 7: u'-'}
+DATETIME_SEPARATORS = {4: u'-', 7: u'-', 10: u' ', 13: u':', 16: u':'}
+FIRST_DAY = numpy.datetime64('0001-01-01')
+
+def _matches(values, width, separators):
+    """Return ``True`` if all ``values`` (a unicode array) have ``width``
+    characters, ``separators`` in the given positions and digits in the
+    others (same as ``outputty.date_regex``/``datetime_regex``)."""
+    if not (numpy.char.str_len(values) == width).all():
+        return False
+    characters = values.astype('U{}'.format(width)).view('U1')
+    characters = characters.reshape(len(values), width)
+    for index in range(width):
+        column = characters[:, index]
+        if index in separators:
+            valid = column == separators[index]
+        else:
+            valid = (column >= u'0') & (column <= u'9')
+        if not valid.all():
+            return False
+    return True
+
+def _to_int(values):
+    converted = values.astype(numpy.int64)
+    if not (converted.astype(unicode) == values).all():
+        raise ValueError('It is float')
+    return converted.tolist()
+
+def _to_float(values):
+    return values.astype(numpy.float64).tolist()
+
+def _to_date(values):
+    if not _matches(values, 10, DATE_SEPARATORS):
+        raise ValueError('It is not a date')
+    converted = values.astype('datetime64[D]')
+    if (converted < FIRST_DAY).any():
+        raise ValueError('Year out of range')
+    return converted.astype(object).tolist()
+
+def _to_datetime(values):
+    if not _matches(values, 19, DATETIME_SEPARATORS):
+        raise ValueError('It is not a datetime')
+    converted = values.astype('datetime64[s]')
+    if (converted < FIRST_DAY).any():
+        raise ValueError('Year out of range')
+    return converted.astype(object).tolist()
+
+CONVERTERS = ((int, _to_int), (float, _to_float), (datetime.date, _to_date),
+              (datetime.datetime, _to_datetime))
+
+def normalize(column, codec, type_=None, cache=None):
+    """Same as ``outputty._normalize`` but each type is tried on the whole
+    column at once, using NumPy arrays. Columns with values that aren't
+    strings (or ``None``) and integers that don't fit in 64 bits are
+    normalized by ``outputty._normalize`` (the only case ``cache`` is used).
+    """
+    if not column:
+        return str, column
+    typed = _typed(column)
+    if typed is not None:
+        return typed, column
+    if not all(value is None or isinstance(value, basestring)
+               for value in column):
+        return _normalize(column, codec, type_, cache)
+    try:
+        text = numpy.array([u'' if value is None else
+                            _str_decode(value, codec) for value in column],
+                           dtype=unicode)
+    except (TypeError, ValueError):
+        return _normalize(column, codec, type_, cache)
+    filled = text != u''
+    values = text[filled]
+    converters = list(CONVERTERS)
+    if type_ is not None:
+        converters.sort(key=lambda converter: converter[0] is not type_)
+    for type_, convert in converters:
+        try:
+            converted = convert(values)
+        except OverflowError:
+            return _normalize(column, codec, cache=cache)
+        except (ValueError, TypeError):
+            continue
+        result = numpy.empty(len(column), dtype=object)
+        result[filled] = converted
+        return type_, result.tolist()
+    return str, [_convert(value, str, codec) for value in column]
@@ -15,6 +15,7 @@
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import datetime
 from textwrap import dedent
 import unittest
 from outputty import Table
@@ -542,6 +543,34 @@ class TestTable(unittest.TestCase):
         ''').strip()
         self.assertEqual(str(table), expected_output)
 
+    def test_order_by_should_accept_many_columns_and_orderings(self):
+        table = Table(headers=['state', 'city', 'population'])
+        table.extend([['RJ', 'Niteroi', 487], ['SP', 'Campinas', 1080],
+                      ['RJ', 'Rio', 6320], ['SP', 'Santos', 419],
+                      ['MG', 'BH', 2375], ['RJ', 'Macae', 206]])
+        table.order_by([('state', 'asc'), ('population', 'desc')])
+        self.assertEquals(table['city'], [u'BH', u'Rio', u'Niteroi',
+                                          u'Macae', u'Campinas', u'Santos'])
+        table.order_by(['state', 'city'], 'desc')
+        self.assertEquals(table['city'], [u'Santos', u'Campinas', u'Rio',
+                                          u'Niteroi', u'Macae', u'BH'])
+        with self.assertRaises(ValueError):
+            table.order_by('state', nulls='middle')
+
+    def test_order_by_should_be_stable_and_place_nulls(self):
+        table = Table(headers=['spam', 'eggs'])
+        table.extend([[datetime.date(2011, 1, 2), 1], [None, 2],
+                      [datetime.date(2011, 1, 1), 3], [None, 4],
+                      [datetime.date(2011, 1, 2), 5]])
+        table.order_by('spam')
+        self.assertEquals(table['eggs'], [2, 4, 3, 1, 5])
+        table.order_by('spam', 'desc')
+        self.assertEquals(table['eggs'], [1, 5, 3, 2, 4])
+        table.order_by('spam', nulls='last')
+        self.assertEquals(table['eggs'], [3, 1, 5, 2, 4])
+        table.order_by('spam', 'desc', nulls='first')
+        self.assertEquals(table['eggs'], [2, 4, 1, 5, 3])
+
     def test_normalize_method_should_transform_all_rows_to_lists(self):
         table = Table(headers=['spam', 'eggs', 'ham'])
         table.append(['ham', 'eggs', 'spam'])
@@ -864,5 +893,44 @@ class TestTable(unittest.TestCase):
         self.assertEquals(table.headers, ['python', 'rules', 'third column'])
         self.assertEquals(table[:], [[1, 2, 2], [3, 4, 12]])
 
+    def test_iter_rows_should_return_rows_accessed_by_position_or_header(self):
+        table = Table(headers=['python', 'rules'])
+        table.extend([[1, 2], [3, 4]])
+        rows = list(table.iter_rows())
+        self.assertEquals(rows, [(1, 2), (3, 4)])
+        self.assertEquals(rows[1]['rules'], 4)
+        self.assertEquals(rows[1][u'python'], 3)
+        self.assertEquals(rows[1][0], 3)
+        self.assertEquals(rows[0].keys(), ['python', 'rules'])
+        self.assertEquals(rows[0].items(), [('python', 1), ('rules', 2)])
+        self.assertEquals(rows[0].get('spam', 42), 42)
+        self.assertTrue(type(rows[0]) is type(rows[1]))
+        with self.assertRaises(KeyError):
+            rows[0]['spam']
+        with self.assertRaises(AttributeError):
+            rows[0].spam = 42
+
+    def test_iter_rows_should_use_current_headers(self):
+        table = Table(headers=['python', 'rules'])
+        table.append([1, 2])
+        del table['python']
+        self.assertEquals(next(table.iter_rows())['rules'], 2)
+
+    def test_exports_should_not_change_the_stored_rows(self):
+        table = Table(headers=['ação', 'spam'], output_encoding='iso-8859-1')
+        table.append(['Álvaro', 42])
+        rows, row = table._rows, table[0]
+        self.assertEquals(table.to_dict(),
+                          {'a\xe7\xe3o': ['\xc1lvaro'], 'spam': [42]})
+        self.assertEquals(table.to_dict(key='ação', value='spam'),
+                          {'\xc1lvaro': 42})
+        self.assertEquals(table.to_list_of_dicts(),
+                          [{'a\xe7\xe3o': '\xc1lvaro', 'spam': 42}])
+        table.write('csv')
+        self.assertTrue(table._rows is rows)
+        self.assertTrue(table[0] is row)
+        self.assertEquals(row, [u'\xc1lvaro', 42])
+        self.assertEquals(table.headers, [u'a\xe7\xe3o', u'spam'])
+
     #TODO:
     # - Plugins: before call `write`, verify if `table.headers` exists
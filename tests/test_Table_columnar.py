@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright 2011 Álvaro Justen
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import datetime
+from cStringIO import StringIO
+from outputty import Table
+
+
+class TestTableColumnar(unittest.TestCase):
+    def setUp(self):
+        self.rows = [[1, 'spam', None], [2, 'eggs', 3.14], [3, 'ham', 2.71]]
+        self.table = Table(headers=['id', 'name', 'value'], columnar=True)
+        self.table.extend(self.rows)
+        self.expected = Table(headers=['id', 'name', 'value'])
+        self.expected.extend(self.rows)
+
+    def test_columnar_should_behave_as_row_storage(self):
+        self.assertEquals(str(self.table), str(self.expected))
+        self.assertEquals(list(self.table), list(self.expected))
+        self.assertEquals(self.table[1], [2, u'eggs', 3.14])
+        self.assertEquals(self.table[-2:], self.expected[-2:])
+        self.assertEquals(len(self.table), 3)
+        self.assertEquals(self.table.to_dict(), self.expected.to_dict())
+        self.assertEquals(self.table.to_dict(key='name', value='id'),
+                          self.expected.to_dict(key='name', value='id'))
+
+    def test_columnar_should_store_columns(self):
+        self.assertEquals(self.table._rows.columns,
+                          [[1, 2, 3], [u'spam', u'eggs', u'ham'],
+                           [None, 3.14, 2.71]])
+        self.assertEquals(self.table['name'], [u'spam', u'eggs', u'ham'])
+
+    def test_columnar_column_operations(self):
+        self.table['id'] = [4, 5, 6]
+        self.table.append_column('double', lambda row: row[0] * 2,
+                                 position=1)
+        del self.table['value']
+        self.assertEquals(self.table.headers, ['id', 'double', 'name'])
+        self.assertEquals(list(self.table), [[4, 8, u'spam'],
+                                             [5, 10, u'eggs'],
+                                             [6, 12, u'ham']])
+
+    def test_changing_returned_row_should_not_change_columnar_table(self):
+        row = self.table[0]
+        row[0] = 42
+        self.assertEquals(self.table[0][0], 1)
+        self.table[0] = row
+        self.assertEquals(self.table[0][0], 42)
+
+    def test_columnar_row_operations(self):
+        self.table.insert(0, [0, 'python', 1.0])
+        self.assertEquals(self.table.pop(), [3, u'ham', 2.71])
+        self.table.remove([1, 'spam', None])
+        self.table.order_by('id', 'desc')
+        self.assertEquals(list(self.table), [[2, u'eggs', 3.14],
+                                             [0, u'python', 1.0]])
+        self.assertEquals(self.table.index([0, 'python', 1.0]), 1)
+        del self.table[:]
+        self.assertEquals(len(self.table), 0)
+        self.assertEquals(self.table['id'], [])
+
+    def test_columnar_csv_read_and_normalize_types(self):
+        table = Table(columnar=True)
+        table.read('csv', StringIO('spam,eggs\n1,2011-01-01\n2,\n'))
+        self.assertEquals(table.types, {'spam': int, 'eggs': datetime.date})
+        self.assertEquals(table._rows.columns,
+                          [[1, 2], [datetime.date(2011, 1, 1), None]])
+
+    def test_normalize_types_compact_should_store_arrays(self):
+        table = Table(headers=['int', 'float', 'date', 'datetime', 'str'])
+        table.extend([['1', '2.5', '2011-01-01', '2011-01-01 02:03:04', 'a'],
+                      [None, '', '', None, 'b']])
+        table.normalize_types(compact=True)
+        self.assertTrue(table.columnar)
+        self.assertEquals([getattr(column, 'data', column).__class__.__name__
+                           for column in table._rows.columns],
+                          ['array', 'array', 'array', 'array', 'list'])
+        self.assertEquals(list(table._rows.columns[0].nulls), [0, 1])
+        self.assertEquals(table[0], [1, 2.5, datetime.date(2011, 1, 1),
+                                     datetime.datetime(2011, 1, 1, 2, 3, 4),
+                                     u'a'])
+        self.assertEquals(table[1], [None, None, None, None, u'b'])
+        self.assertEquals(table['date'], [datetime.date(2011, 1, 1), None])
+
+    def test_compact_column_should_accept_values_of_other_types(self):
+        self.table.normalize_types(compact=True)
+        self.table.append([4, 'python', 1.5])
+        self.assertEquals(self.table._rows.columns[0].data.typecode, 'l')
+        self.table[0] = ['one', 'spam', None]
+        self.table.order_by('value')
+        self.assertEquals(self.table['id'], [u'one', 4, 3, 2])
+        self.assertEquals(self.table['value'], [None, 1.5, 2.71, 3.14])
+        self.assertEquals(self.table._rows.columns[2].data.typecode, 'd')
+
+    def test_normalize_types_dictionary_should_encode_text_columns(self):
+        table = Table(headers=['name', 'city', 'id'])
+        table.extend([['ana', 'rio', '1'], ['bia', 'sp', '2'],
+                      ['caio', 'rio', '3'], ['davi', None, '4']])
+        table.normalize_types(dictionary=3)
+        self.assertTrue(table.columnar)
+        columns = table._rows.columns
+        self.assertEquals(columns[0], [u'ana', u'bia', u'caio', u'davi'])
+        self.assertFalse(hasattr(columns[0], 'codes'))
+        self.assertEquals(columns[1].values, [u'rio', u'sp', None])
+        self.assertEquals(list(columns[1].codes), [0, 1, 0, 2])
+        self.assertEquals(table['city'], [u'rio', u'sp', u'rio', None])
+        self.assertEquals(table[1], [u'bia', u'sp', 2])
+        self.assertFalse(hasattr(columns[2], 'codes'))
+
+    def test_dictionary_column_should_become_list_when_needed(self):
+        table = Table(headers=['city'])
+        table.extend([['rio'], ['sp']])
+        table.normalize_types(dictionary=2)
+        table.append([u'rio'])
+        self.assertEquals(table._rows.columns[0].values, [u'rio', u'sp'])
+        table.append([u'bh'])
+        self.assertEquals(table._rows.columns[0].__class__, list)
+        self.assertEquals(table['city'], [u'rio', u'sp', u'rio', u'bh'])
+
+    def test_order_by_and_count_on_dictionary_column(self):
+        table = Table(headers=['city', 'id'])
+        table.extend([['sp', '1'], ['rio', '2'], ['bh', '3'], ['rio', '4'],
+                      ['', '5']])
+        table.normalize_types(dictionary=10)
+        table.order_by('city')
+        self.assertEquals(list(table), [[None, 5], [u'bh', 3], [u'rio', 2],
+                                        [u'rio', 4], [u'sp', 1]])
+        table.order_by('city', 'desc')
+        self.assertEquals(table['city'], [u'sp', u'rio', u'rio', u'bh', None])
+        self.assertEquals(table['id'], [1, 2, 4, 3, 5])
+        self.assertEquals(table.count([u'rio', 4]), 1)
+        self.assertEquals(table.count([u'rio', 5]), 0)
+        self.assertEquals(table.count([u'poa', 4]), 0)
+
+    def test_external_order_by_should_keep_columns_storage(self):
+        table = Table(headers=['city', 'id', 'value'])
+        table.extend([['sp', '1', '2.5'], ['rio', '2', ''],
+                      ['bh', '3', '1.5'], ['rio', '4', '0.5']])
+        table.normalize_types(compact=True, dictionary=10)
+        table.order_by([('city', 'asc'), ('id', 'desc')], external=True,
+                       run_size=3)
+        self.assertEquals(list(table), [[u'bh', 3, 1.5], [u'rio', 4, 0.5],
+                                        [u'rio', 2, None], [u'sp', 1, 2.5]])
+        columns = table._rows.columns
+        self.assertEquals(list(columns[0].codes), [2, 1, 1, 0])
+        self.assertEquals(columns[1].data.typecode, 'l')
+        self.assertEquals(columns[2].data.typecode, 'd')
+
+    def test_csv_write_with_dictionary_column(self):
+        table = Table(headers=['city', 'id'], input_encoding='utf-8',
+                      output_encoding='iso-8859-1')
+        table.read('csv', StringIO('city,id\nSão Paulo,1\nRio,2\n'
+                                   'São Paulo,3\n'), dictionary=5)
+        self.assertEquals(table._rows.columns[0].values,
+                          ['São Paulo'.decode('utf-8'), u'Rio'])
+        self.assertEquals(table.write('csv'),
+                          '"city","id"\n"S\xe3o Paulo","1"\n"Rio","2"\n'
+                          '"S\xe3o Paulo","3"\n')
+
+    def test_csv_rows_of_columnar_table_should_be_encoded_lazily(self):
+        plugin_csv = self.table._load_plugin('csv')
+        self.table.normalize_types(dictionary=5)
+        rows = plugin_csv._encoded_rows(self.table, 1, 'utf-8', 'utf-8')
+        self.table[2] = [3, u'spam', 1.5]
+        self.assertEquals(list(rows), [(2, 'eggs', 3.14), (3, 'spam', 1.5)])
+
+    def test_compact_column_should_be_iterated_lazily(self):
+        self.table.normalize_types(compact=True)
+        column = self.table._rows.columns[2]
+        values = iter(column)
+        self.assertEquals(next(values), None)
+        column[1] = 1.5
+        self.assertEquals(list(values), [1.5, 2.71])
+        self.assertTrue(None in column)
+        self.assertTrue(2.71 in column)
+        self.assertFalse(3.14 in column)
+        self.assertFalse(None in self.table._rows.columns[0])
@@ -16,6 +16,7 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import unittest
+import bz2
 import tempfile
 import os
 from cStringIO import StringIO
@@ -310,3 +311,400 @@ class TestTableCsv(unittest.TestCase):
         self.assertEquals(my_table[0], [42, 3.0, datetime.date(2011, 1, 2)])
         self.assertEquals(my_table[1], [1, 3.14, datetime.date(2012, 1, 11)])
         self.assertEquals(my_table[2], [21, 6.28, datetime.date(2010, 1, 3)])
+
+    def test_iter_read_should_yield_tables_with_at_most_chunk_rows(self):
+        data = dedent('''
+        "spam","eggs"
+        "1","2011-01-02"
+        "2","2012-01-11"
+        "3","2010-01-03"
+        "4",""
+        "5","2010-01-05"
+        ''')
+        my_table = Table()
+        chunks = list(my_table.iter_read('csv', StringIO(data), chunk_rows=2))
+        self.assertEquals(my_table.headers, [u'spam', u'eggs'])
+        self.assertEquals([len(chunk) for chunk in chunks], [2, 2, 1])
+        for chunk in chunks:
+            self.assertEquals(chunk.headers, [u'spam', u'eggs'])
+        self.assertEquals(chunks[0][1], [2, datetime.date(2012, 1, 11)])
+        self.assertEquals(chunks[1][1], [4, None])
+        self.assertEquals(chunks[2][0], [5, datetime.date(2010, 1, 5)])
+
+    def test_iter_read_should_accept_read_options(self):
+        data = "'spam';'eggs'\r\n'1';'a;b'\r\n'2';'c\nd'\r\n"
+        temp_fp = tempfile.NamedTemporaryFile(delete=False)
+        temp_fp.write(data.decode('utf8').encode('utf16'))
+        temp_fp.close()
+        my_table = Table(input_encoding='utf16')
+        chunks = list(my_table.iter_read('csv', temp_fp.name, delimiter=';',
+                                         quote_char="'", line_terminator='\r\n',
+                                         convert_types=False))
+        os.remove(temp_fp.name)
+        self.assertEquals(len(chunks), 1)
+        self.assertEquals(chunks[0][0], [u'1', u'a;b'])
+        self.assertEquals(chunks[0][1], [u'2', u'c\nd'])
+
+    def test_read_csv_should_handle_data_bigger_than_block_size(self):
+        plugin_csv = Table()._load_plugin('csv')
+        block_size = plugin_csv.BLOCK_SIZE
+        plugin_csv.BLOCK_SIZE = 7
+        try:
+            data = '"spam","eggs"\n"Álvaro","1"\n"Píton","2"\n'
+            my_table = Table()
+            my_table.read('csv', StringIO(data))
+        finally:
+            plugin_csv.BLOCK_SIZE = block_size
+        self.assertEquals(my_table[0], ['Álvaro'.decode('utf8'), 1])
+        self.assertEquals(my_table[1], ['Píton'.decode('utf8'), 2])
+
+    def test_write_csv_should_not_change_table_rows(self):
+        my_table = Table(headers=['spam', 'eggs'])
+        my_table.append(['Álvaro', 42])
+        rows = my_table._rows
+        first_row = my_table[0]
+        contents = my_table.write('csv')
+        self.assertEquals(contents, '"spam","eggs"\n"Álvaro","42"\n')
+        self.assertTrue(my_table._rows is rows)
+        self.assertTrue(my_table[0] is first_row)
+        self.assertEquals(type(my_table[0][0]), types.UnicodeType)
+
+    def test_write_csv_should_write_in_blocks(self):
+        class FakeFile(object):
+            def __init__(self):
+                self.writes = []
+
+            def write(self, data):
+                self.writes.append(data)
+
+        plugin_csv = Table()._load_plugin('csv')
+        block_size = plugin_csv.BLOCK_SIZE
+        plugin_csv.BLOCK_SIZE = 20
+        my_table = Table(headers=['spam'])
+        my_table.extend([[str(number) * 5] for number in range(10)])
+        fake_fp = FakeFile()
+        try:
+            my_table.write('csv', fake_fp)
+        finally:
+            plugin_csv.BLOCK_SIZE = block_size
+        self.assertEquals(len(fake_fp.writes), 4)
+        self.assertEquals(''.join(fake_fp.writes),
+                          '"spam"\n' + ''.join(['"%s"\n' % (str(number) * 5)
+                                                for number in range(10)]))
+
+    def test_read_csv_with_workers_should_return_same_data_as_serial(self):
+        lines = ['"spam","eggs","ham"']
+        for number in range(300):
+            lines.append('"%d","%s","line\n%d, ""quoted"""' % \
+                         (number, '2011-01-02' if number % 7 else '',
+                          number))
+        lines.append('"3.14","2011-01-02","Álvaro"')
+        temp_fp = tempfile.NamedTemporaryFile(delete=False)
+        temp_fp.write('\n'.join(lines) + '\n')
+        temp_fp.close()
+        serial_table = Table()
+        serial_table.read('csv', temp_fp.name)
+        parallel_table = Table()
+        parallel_table.read('csv', temp_fp.name, workers=4)
+        not_converted = Table()
+        not_converted.read('csv', temp_fp.name, workers=3,
+                           convert_types=False)
+        os.remove(temp_fp.name)
+        self.assertEquals(parallel_table.headers, serial_table.headers)
+        self.assertEquals(parallel_table.types, serial_table.types)
+        self.assertEquals(parallel_table.types['spam'], float)
+        self.assertEquals(parallel_table[:], serial_table[:])
+        self.assertEquals(len(not_converted), 301)
+        self.assertEquals(not_converted[7], [u'7', u'', u'line\n7, "quoted"'])
+
+    def test_read_csv_with_workers_and_only_headers(self):
+        temp_fp = tempfile.NamedTemporaryFile(delete=False)
+        temp_fp.write('"spam","eggs"\n')
+        temp_fp.close()
+        my_table = Table()
+        my_table.read('csv', temp_fp.name, workers=2)
+        os.remove(temp_fp.name)
+        self.assertEquals(my_table.headers, [u'spam', u'eggs'])
+        self.assertEquals(len(my_table), 0)
+        self.assertEquals(my_table.types, {u'spam': str, u'eggs': str})
+
+    def test_read_csv_with_mmap_should_return_same_data(self):
+        data = dedent('''
+        "spam","eggs","ham"
+        "42","3","Álvaro"
+        "","3.14","multi
+        line"
+        "21","","Píton"
+        ''')
+        for encoding in ('utf8', 'iso-8859-1', 'utf16'):
+            temp_fp = tempfile.NamedTemporaryFile(delete=False)
+            temp_fp.write(data.decode('utf8').encode(encoding))
+            temp_fp.close()
+            my_table = Table(input_encoding=encoding)
+            my_table.read('csv', temp_fp.name)
+            mapped_table = Table(input_encoding=encoding)
+            mapped_table.read('csv', temp_fp.name, mmap=True)
+            parallel_table = Table(input_encoding=encoding)
+            parallel_table.read('csv', temp_fp.name, mmap=True, workers=2)
+            os.remove(temp_fp.name)
+            self.assertEquals(mapped_table.headers, my_table.headers)
+            self.assertEquals(mapped_table[:], my_table[:])
+            self.assertEquals(parallel_table[:], my_table[:])
+            self.assertEquals(mapped_table[1][2], u'multi\nline')
+
+    def test_read_csv_with_mmap_and_empty_file(self):
+        temp_fp = tempfile.NamedTemporaryFile(delete=False)
+        temp_fp.close()
+        my_table = Table()
+        my_table.read('csv', temp_fp.name, mmap=True)
+        os.remove(temp_fp.name)
+        self.assertEquals(str(my_table), '')
+
+    def test_read_csv_should_read_only_some_columns(self):
+        data = dedent('''
+        "spam","eggs","ham"
+        "42","3.14","2011-01-02"
+        "21","2.71","2012-01-11"
+        ''')
+        temp_fp = tempfile.NamedTemporaryFile(delete=False)
+        temp_fp.write(data)
+        temp_fp.close()
+        my_table = Table()
+        my_table.read('csv', temp_fp.name, columns=['ham', 'spam'])
+        parallel_table = Table()
+        parallel_table.read('csv', temp_fp.name, columns=['ham', 'spam'],
+                            workers=2)
+        chunks = list(Table().iter_read('csv', temp_fp.name,
+                                        columns=['eggs']))
+        os.remove(temp_fp.name)
+        self.assertEquals(my_table.headers, [u'ham', u'spam'])
+        self.assertEquals(my_table[:], [[datetime.date(2011, 1, 2), 42],
+                                        [datetime.date(2012, 1, 11), 21]])
+        self.assertEquals(set(my_table.types), set([u'ham', u'spam']))
+        self.assertEquals(parallel_table.headers, my_table.headers)
+        self.assertEquals(parallel_table[:], my_table[:])
+        self.assertEquals(chunks[0][:], [[3.14], [2.71]])
+
+    def test_read_csv_should_raise_ValueError_when_column_not_found(self):
+        my_table = Table()
+        with self.assertRaises(ValueError):
+            my_table.read('csv', StringIO('"spam"\n"1"\n'), columns=['eggs'])
+
+    def test_read_csv_should_store_only_rows_matching_where(self):
+        data = dedent('''
+        "state","population","founded"
+        "RJ","16000000","1565-03-01"
+        "SP","41000000","unknown"
+        "RJ","","1565-03-01"
+        "MG","19000000","1709-11-09"
+        ''')
+        my_table = Table()
+        my_table.read('csv', StringIO(data),
+                      where=[('population', '>', 17000000),
+                             ('state', 'in', ['RJ', 'SP', 'MG']),
+                             ('founded', '!=', 'unknown')])
+        self.assertEquals(my_table[:], [[u'MG', 19000000,
+                                         datetime.date(1709, 11, 9)]])
+        self.assertEquals(my_table.types['founded'], datetime.date)
+
+        other_table = Table()
+        other_table.read('csv', StringIO(data), where=('state', '==', 'RJ'),
+                         columns=['population'])
+        self.assertEquals(other_table[:], [[16000000], [None]])
+
+        null_table = Table()
+        null_table.read('csv', StringIO(data),
+                        where=('population', '==', None))
+        self.assertEquals(len(null_table), 1)
+        self.assertEquals(null_table[0][0], u'RJ')
+
+    def test_read_csv_should_accept_a_function_as_where(self):
+        data = dedent('''
+        "spam","eggs"
+        "1","a"
+        "2","b"
+        "3","c"
+        ''')
+        chunks = list(Table().iter_read('csv', StringIO(data),
+                                        where=lambda row: row['eggs'] != 'b'))
+        self.assertEquals(chunks[0][:], [[1, u'a'], [3, u'c']])
+        my_table = Table()
+        with self.assertRaises(ValueError):
+            my_table.read('csv', StringIO(data), where=('spam', '~', 1))
+
+    def test_read_csv_where_should_compare_numbers_as_after_conversion(self):
+        data = 'name,price\na,1\nb,3.5\nc,\nd,10\n'
+        my_table = Table()
+        my_table.read('csv', StringIO(data), where=('price', '>', 3))
+        self.assertEquals(my_table[:], [[u'b', 3.5], [u'd', 10.0]])
+        my_table = Table()
+        my_table.read('csv', StringIO(data),
+                      where=('price', 'in', [1, 'n/a', 3.5]))
+        self.assertEquals(my_table['name'], [u'a', u'b'])
+        my_table = Table()
+        my_table.read('csv', StringIO(data),
+                      where=('name', 'in', [1, 'd']))
+        self.assertEquals(my_table['name'], [u'd'])
+        scan = Table().scan('csv', StringIO(data))
+        self.assertEquals(list(scan.order_by('name').filter(('price', '>',
+                                                             3))),
+                          [[u'b', 3.5], [u'd', 10.0]])
+
+    def test_read_csv_should_concatenate_many_files(self):
+        temp_dir = tempfile.mkdtemp()
+        filenames = []
+        for index in range(3):
+            filename = os.path.join(temp_dir, 'shard-%d.csv' % index)
+            fp = open(filename, 'w')
+            fp.write('"spam","eggs"\n"%d","%s"\n"%d","x"\n' % \
+                     (index, '3.14' if index == 2 else '1', index * 10))
+            fp.close()
+            filenames.append(filename)
+        my_table = Table()
+        my_table.read('csv', filenames)
+        glob_table = Table()
+        glob_table.read('csv', os.path.join(temp_dir, 'shard-*.csv'),
+                        workers=2)
+        parallel_table = Table()
+        parallel_table.read('csv', filenames, workers=3, columns=['spam'])
+        for filename in filenames:
+            os.remove(filename)
+        os.rmdir(temp_dir)
+        self.assertEquals(my_table[:], [[0, u'1'], [0, u'x'], [1, u'1'],
+                                        [10, u'x'], [2, u'3.14'],
+                                        [20, u'x']])
+        self.assertEquals(glob_table[:], my_table[:])
+        self.assertEquals(glob_table.types, my_table.types)
+        self.assertEquals(parallel_table[:], [[0], [0], [1], [10], [2], [20]])
+
+    def test_read_csv_should_raise_ValueError_if_headers_are_different(self):
+        filenames = []
+        for headers in ('"spam","eggs"', '"spam","ham"'):
+            temp_fp = tempfile.NamedTemporaryFile(delete=False)
+            temp_fp.write(headers + '\n"1","2"\n')
+            temp_fp.close()
+            filenames.append(temp_fp.name)
+        try:
+            with self.assertRaises(ValueError):
+                Table().read('csv', filenames)
+            with self.assertRaises(ValueError):
+                Table().read('csv', filenames, workers=2)
+        finally:
+            for filename in filenames:
+                os.remove(filename)
+
+    def test_read_csv_should_not_share_dialect_between_calls(self):
+        first_table = Table()
+        chunks = first_table.iter_read('csv', StringIO("'a';'b'\n'1';'2'\n"),
+                                       delimiter=';', quote_char="'")
+        second_table = Table()
+        second_table.read('csv', StringIO('"a","b"\n"3","4"\n'))
+        self.assertEquals(list(chunks)[0][:], [[1, 2]])
+        self.assertEquals(second_table[:], [[3, 4]])
+
+    def test_write_and_read_compressed_csv(self):
+        my_table = Table(headers=['spam', 'eggs'])
+        my_table.extend([['Álvaro', 1], ['Píton', 2]] * 50)
+        plugin_csv = my_table._load_plugin('csv')
+        compressions = ['gz', 'bz2']
+        if plugin_csv.lzma is not None:
+            compressions.append('xz')
+        for compression in compressions:
+            temp_fp = tempfile.NamedTemporaryFile(delete=False,
+                                                  suffix='.' + compression)
+            temp_fp.close()
+            my_table.write('csv', temp_fp.name)
+            contents = open(temp_fp.name).read()
+            new_table = Table()
+            new_table.read('csv', temp_fp.name)
+            parallel_table = Table()
+            parallel_table.read('csv', [temp_fp.name, temp_fp.name],
+                                workers=2)
+            os.remove(temp_fp.name)
+            magic = plugin_csv.COMPRESSIONS[compression][0]
+            self.assertTrue(contents.startswith(magic))
+            self.assertEquals(new_table.headers, [u'spam', u'eggs'])
+            self.assertEquals(new_table[:], my_table[:])
+            self.assertEquals(parallel_table[:], my_table[:] * 2)
+
+    def test_read_compressed_csv_should_detect_compression_by_content(self):
+        my_table = Table(headers=['spam'])
+        my_table.append(['eggs'])
+        compressed = StringIO()
+        my_table.write('csv', compressed, compression='gz')
+        compressed.seek(0)
+        new_table = Table()
+        new_table.read('csv', compressed)
+        self.assertEquals(new_table[:], [[u'eggs']])
+        self.assertEquals(my_table.write('csv', compression='bz2'),
+                          bz2.compress('"spam"\n"eggs"\n'))
+
+    def test_read_compressed_csv_with_many_members_or_streams(self):
+        plugin_csv = Table()._load_plugin('csv')
+        for compression in ('gz', 'bz2'):
+            compress = plugin_csv.COMPRESSIONS[compression][2]
+            contents = ''
+            for data in ('"spam"\n"eggs"\n', '"ham"\n'):
+                compressor = compress()
+                contents += compressor.compress(data) + compressor.flush()
+            my_table = Table()
+            my_table.read('csv', StringIO(contents))
+            self.assertEquals(my_table[:], [[u'eggs'], [u'ham']])
+            # members also split between blocks
+            plugin_csv.BLOCK_SIZE, block_size = 7, plugin_csv.BLOCK_SIZE
+            try:
+                my_table = Table()
+                my_table.read('csv', StringIO(contents),
+                              compression=compression)
+            finally:
+                plugin_csv.BLOCK_SIZE = block_size
+            self.assertEquals(my_table[:], [[u'eggs'], [u'ham']])
+
+    def test_write_csv_in_append_mode_should_write_only_new_rows(self):
+        temp_fp = tempfile.NamedTemporaryFile(delete=False)
+        temp_fp.write('old contents\n')
+        temp_fp.close()
+        my_table = Table(headers=['spam'])
+        my_table.append(['1'])
+        my_table.write('csv', temp_fp.name, mode='append')
+        my_table.extend([['2'], ['3']])
+        my_table.write('csv', temp_fp.name, mode='append')
+        my_table.write('csv', temp_fp.name, mode='append')
+        contents = open(temp_fp.name).read()
+        self.assertEquals(contents, '"spam"\n"1"\n"2"\n"3"\n')
+
+        fp = open(temp_fp.name, 'a')
+        fp.write('"changed"\n')
+        fp.close()
+        my_table.append(['4'])
+        my_table.write('csv', temp_fp.name, mode='append')
+        contents = open(temp_fp.name).read()
+        os.remove(temp_fp.name)
+        self.assertEquals(contents, '"spam"\n"1"\n"2"\n"3"\n"4"\n')
+
+    def test_write_csv_in_append_mode_should_raise_ValueError_if_invalid(self):
+        my_table = Table(headers=['spam'])
+        with self.assertRaises(ValueError):
+            my_table.write('csv', StringIO(), mode='append')
+        with self.assertRaises(ValueError):
+            my_table.write('csv', 'spam.csv.gz', mode='append')
+        with self.assertRaises(ValueError):
+            my_table.write('csv', 'spam.csv', mode='spam')
+        self.assertFalse(os.path.exists('spam.csv'))
+        self.assertFalse(os.path.exists('spam.csv.gz'))
+
+    def test_read_csv_with_declared_types(self):
+        data = 'spam,eggs\n1,2011-01-01\n2,2011-01-02\n'
+        table = Table()
+        table.read('csv', StringIO(data), types={'spam': str})
+        self.assertEquals(table.types, {'spam': str, 'eggs': datetime.date})
+        self.assertEquals(table[0], [u'1', datetime.date(2011, 1, 1)])
+        temp_fp = tempfile.NamedTemporaryFile(delete=False)
+        temp_fp.write(data)
+        temp_fp.close()
+        other = Table()
+        other.read('csv', temp_fp.name, workers=2,
+                   types={'spam': str, 'eggs': str})
+        os.remove(temp_fp.name)
+        self.assertEquals(list(other), [[u'1', u'2011-01-01'],
+                                        [u'2', u'2011-01-02']])
@@ -125,3 +125,141 @@ class TestTableDataTypes(unittest.TestCase):
         self.assertEquals(table.types['Monty'], datetime.datetime)
         self.assertEquals(table.types['Python'], str)
 
+
+    def test_normalize_types_with_sample_should_return_same_types(self):
+        table = Table(headers=['spam', 'eggs', 'ham', 'Monty', 'Python'])
+        for i in range(100):
+            table.append([str(i), '{}.5'.format(i), '2011-01-{:02d}'.format(i % 28 + 1),
+                          '2011-01-01 02:03:{:02d}'.format(i % 60), 'a' * i])
+        other = Table(headers=table.headers)
+        other.extend(table)
+        table.normalize_types()
+        other.normalize_types(sample=10)
+        self.assertEquals(other.types, table.types)
+        self.assertEquals(list(other), list(table))
+
+    def test_normalize_types_with_sample_should_fallback_if_value_does_not_fit(self):
+        table = Table(headers=['spam', 'eggs'])
+        table.extend([[str(i), None] for i in range(100)])
+        table[99] = ['3.14', 'python']
+        table.normalize_types(sample=10)
+        self.assertEquals(table.types['spam'], float)
+        self.assertEquals(table.types['eggs'], str)
+        self.assertEquals(table[0][0], 0.0)
+        self.assertEquals(table[99][0], 3.14)
+
+    def test_normalize_types_should_use_str_for_invalid_dates(self):
+        table = Table(headers=['spam', 'eggs'])
+        table.append(['2011-01-01', '2011-01-01 02:03:04'])
+        table.append(['2011-13-45', '2011-01-01 25:03:04'])
+        table.normalize_types()
+        self.assertEquals(table.types['spam'], str)
+        self.assertEquals(table.types['eggs'], str)
+        self.assertEquals(table[1], [u'2011-13-45', u'2011-01-01 25:03:04'])
+
+    def test_normalize_types_should_keep_values_of_typed_columns(self):
+        table = Table(headers=['spam', 'eggs'])
+        table.append([datetime.date(2011, 1, 1), 1.5])
+        table.append([None, '2'])
+        table.normalize_types()
+        self.assertEquals(table.types['spam'], datetime.date)
+        self.assertEquals(table.types['eggs'], float)
+        self.assertEquals(table[0], [datetime.date(2011, 1, 1), 1.5])
+        self.assertEquals(table[1], [None, 2.0])
+
+    def test_normalize_types_with_workers_should_return_same_result(self):
+        headers = ['column{}'.format(index) for index in range(12)]
+        rows = [[str(index * row), '{}.5'.format(row), '2011-01-01', 'a',
+                 None, '', '1', '2', '3', '2011-01-01 00:00:00', 'x', '4']
+                for row in range(50)]
+        table = Table(headers=headers)
+        table.extend(rows)
+        other = Table(headers=headers)
+        other.extend(rows)
+        table.normalize_types()
+        other.normalize_types(workers=3)
+        self.assertEquals(other.types, table.types)
+        self.assertEquals(list(other), list(table))
+
+    def test_normalize_types_with_cache_should_return_same_result(self):
+        rows = [['2011-01-{:02d}'.format(index % 3 + 1), str(index % 2),
+                 'spam'] for index in range(30)]
+        table = Table(headers=['spam', 'eggs', 'ham'])
+        table.extend(rows)
+        other = Table(headers=['spam', 'eggs', 'ham'])
+        other.extend(rows)
+        table.normalize_types()
+        other.normalize_types(cache=4)
+        self.assertEquals(other.types, table.types)
+        self.assertEquals(list(other), list(table))
+        self.assertEquals(set(other.parse_caches.keys()),
+                          set(['spam', 'eggs', 'ham']))
+        self.assertEquals(other.parse_caches['eggs'].misses, 2)
+        self.assertEquals(other.parse_caches['eggs'].hits, 28)
+        self.assertTrue(other.parse_caches['spam'].hit_rate > 0.8)
+        self.assertEquals(other.parse_caches['ham'].hit_rate, 0.0)
+
+    def test_cache_should_not_mix_equal_values_of_other_types(self):
+        tables = []
+        for cache in (None, 100):
+            table = Table(headers=['spam', 'eggs'])
+            table.extend([[3, True], [3.0, 1]])
+            table.normalize_types(cache=cache)
+            tables.append(table)
+        self.assertEquals(tables[0].types['spam'], float)
+        self.assertEquals(tables[1].types, tables[0].types)
+        for table in tables:
+            self.assertEquals([type(value) for value in table['spam']],
+                              [float, float])
+        self.assertEquals([map(type, row) for row in tables[1]],
+                          [map(type, row) for row in tables[0]])
+
+    def test_normalize_types_should_use_declared_types(self):
+        table = Table(headers=['spam', 'eggs', 'ham'],
+                      types={'spam': float, 'eggs': str})
+        table.append(['1', '2', '3'])
+        table.append(['', None, '4'])
+        self.assertEquals(table.types, {'spam': float, 'eggs': str})
+        table.normalize_types()
+        self.assertEquals(table.types, {'spam': float, 'eggs': str,
+                                        'ham': int})
+        self.assertEquals(table[0], [1.0, u'2', 3])
+        self.assertEquals(table[1], [None, None, 4])
+
+    def test_normalize_types_should_raise_ValueError_if_value_is_not_declared_type(self):
+        table = Table(headers=['spam'], types={'spam': datetime.date})
+        table.append(['2011-01-01'])
+        table.append(['spam'])
+        with self.assertRaises(ValueError):
+            table.normalize_types()
+
+    def test_track_types_should_update_types_when_rows_change(self):
+        table = Table(headers=['spam', 'eggs'], track_types=True)
+        table.append(['1', '2011-01-01'])
+        self.assertEquals(table.types, {'spam': int, 'eggs': datetime.date})
+        table.extend([['2.5', None], ['3', '']])
+        self.assertEquals(table.types, {'spam': float, 'eggs': datetime.date})
+        table.insert(0, ['spam', '2011-01-01 00:00:00'])
+        self.assertEquals(table.types, {'spam': str, 'eggs': str})
+        table.pop(0)
+        self.assertEquals(table.types, {'spam': float, 'eggs': datetime.date})
+        table[1] = ['2', '2011-01-02']
+        self.assertEquals(table.types, {'spam': int, 'eggs': datetime.date})
+        del table[0]
+        table.remove(['2', '2011-01-02'])
+        self.assertEquals(table.types, {'spam': int, 'eggs': int})
+        self.assertEquals(len(table), 1)
+
+    def test_track_types_should_return_same_types_as_full_identification(self):
+        rows = [['1', 2, None, '2011-01-01 00:00:00'],
+                ['', 3, 'eggs', '2011-01-01'],
+                [None, 4.5, '3', '2011-01-01 00:00:00']]
+        table = Table(headers=['spam', 'eggs', 'ham', 'Monty'],
+                      track_types=True)
+        table.extend(rows)
+        table._rows.append(['2', 1, 'ham', None])
+        other = Table(headers=table.headers)
+        other.extend(table)
+        table._identify_type_of_data()
+        other._identify_type_of_data()
+        self.assertEquals(table.types, other.types)
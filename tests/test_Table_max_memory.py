@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright 2011 Álvaro Justen
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import datetime
+import weakref
+from cStringIO import StringIO
+from outputty import Table, _SpilledRows, _bytes
+
+
+class Rows(list):
+    pass
+
+
+class Value(int):
+    """An ``int`` that calls ``Value.compared`` when compared."""
+    compared = staticmethod(lambda: None)
+
+    def __lt__(self, other):
+        Value.compared()
+        return int(self) < int(other)
+
+
+class TestTableMaxMemory(unittest.TestCase):
+    def setUp(self):
+        self.rows = [[i, 'row {}'.format(i), (i * 7) % 5] for i in range(20)]
+        self.table = Table(headers=['id', 'name', 'value'], max_memory=1)
+        self.table._rows = _SpilledRows(1, block_rows=3)
+        self.table.extend(self.rows)
+        self.expected = Table(headers=['id', 'name', 'value'])
+        self.expected.extend(self.rows)
+
+    def test_bytes(self):
+        self.assertEquals(_bytes(None), None)
+        self.assertEquals(_bytes(1024), 1024)
+        self.assertEquals(_bytes('2GB'), 2 * 1024 ** 3)
+        self.assertEquals(_bytes('1.5 kb'), 1536)
+        with self.assertRaises(ValueError):
+            _bytes('2 apples')
+        with self.assertRaises(ValueError):
+            Table(columnar=True, max_memory='1MB')
+
+    def test_rows_should_spill_to_disk(self):
+        blocks = self.table._rows.blocks
+        self.assertEquals(len(blocks), 7)
+        self.assertTrue(all(block.rows is None for block in blocks[:-1]))
+        self.assertEquals(blocks[-1].rows, self.rows[18:])
+        self.assertEquals(list(self.table), list(self.expected))
+        self.assertEquals(str(self.table), str(self.expected))
+        self.assertEquals(self.table[7], self.expected[7])
+        self.assertEquals(self.table[-1], self.expected[-1])
+        self.assertEquals(self.table[4:15:3], self.expected[4:15:3])
+        self.assertEquals(self.table[::-2], self.expected[::-2])
+        self.assertEquals(self.table['name'], self.expected['name'])
+        self.assertEquals(self.table.index([5, u'row 5', 0]), 5)
+        self.assertEquals(self.table.count([5, u'row 5', 0]), 1)
+        self.assertEquals(len(self.table), 20)
+
+    def test_rows_in_memory_should_not_spill(self):
+        table = Table(headers=['id', 'name', 'value'], max_memory='1MB')
+        table.extend(self.rows)
+        self.assertEquals(table._rows.file, None)
+        self.assertEquals(list(table), list(self.expected))
+
+    def test_changing_spilled_rows(self):
+        for table in (self.table, self.expected):
+            table[2] = [100, 'changed', 1]
+            table[5:9] = [[101, 'new', 2]]
+            del table[0]
+            del table[10:12]
+            del table[::4]
+            table.insert(3, [102, 'inserted', 3])
+            table.append([103, 'appended', 4])
+            table.remove([100, 'changed', 1])
+            table.pop(1)
+            table.reverse()
+            table['double'] = [row[0] * 2 for row in table]
+            del table['value']
+        self.assertEquals(list(self.table), list(self.expected))
+        self.assertEquals(self.table.headers, self.expected.headers)
+
+    def test_order_by_should_merge_sorted_blocks(self):
+        for table in (self.table, self.expected):
+            table.order_by('value', 'desc')
+        self.assertEquals(list(self.table), list(self.expected))
+        self.table.order_by('value')
+        self.expected.order_by('value')
+        self.assertEquals(list(self.table), list(self.expected))
+        self.assertEquals(self.table[0], [0, u'row 0', 0])
+
+    def test_normalize_types_and_csv_with_max_memory(self):
+        table = Table(max_memory=1)
+        table._rows = _SpilledRows(1, block_rows=2)
+        data = 'id,date\n1,2011-01-01\n2,\n3,2011-01-03\n'
+        table.read('csv', StringIO(data))
+        self.assertEquals(table.types, {'id': int, 'date': datetime.date})
+        self.assertEquals(table[2], [3, datetime.date(2011, 1, 3)])
+        self.assertEquals(table.write('csv'),
+                          '"id","date"\n"1","2011-01-01"\n"2",""\n'
+                          '"3","2011-01-03"\n')
+        self.assertEquals(table.to_dict(), {'id': [1, 2, 3],
+                                            'date': [datetime.date(2011, 1, 1),
+                                                     None,
+                                                     datetime.date(2011, 1, 3)]})
+
+    def test_external_order_by_should_merge_sorted_runs(self):
+        orderings = [('value', 'desc'), ('name', 'asc')]
+        self.expected.order_by(orderings)
+        table = Table(headers=['id', 'name', 'value'])
+        table.extend(self.rows)
+        table.order_by(orderings, external=True, run_size=3)
+        self.assertEquals(list(table), list(self.expected))
+        self.table.order_by(orderings, external=True, run_size=4)
+        self.assertTrue(isinstance(self.table._rows, _SpilledRows))
+        self.assertEquals(list(self.table), list(self.expected))
+
+    def test_external_order_by_should_release_rows_before_merging(self):
+        released = []
+        table = Table(headers=['value'])
+        table._rows = Rows([[Value(row[2])] for row in self.rows])
+        rows = weakref.ref(table._rows)
+        Value.compared = staticmethod(lambda: released.append(rows() is None))
+        table.order_by('value', external=True, run_size=3)
+        Value.compared = staticmethod(lambda: None)
+        self.assertTrue(released[-1])
+        self.assertEquals(table['value'], sorted(row[2] for row in self.rows))
+        table = Table(headers=['value'])
+        table.order_by('value', external=True)
+        self.assertEquals(table._rows, [])
+
+    def test_external_order_by_should_be_stable_and_place_nulls(self):
+        table = Table(headers=['spam', 'eggs'])
+        table.extend([[datetime.date(2011, 1, 2), 1], [None, 2],
+                      [datetime.date(2011, 1, 1), 3], [None, 4],
+                      [datetime.date(2011, 1, 2), 5]])
+        table.order_by('spam', 'desc', external=True, run_size=2)
+        self.assertEquals(table['eggs'], [1, 5, 3, 2, 4])
+        table.order_by('spam', nulls='last', external=True, run_size=2)
+        self.assertEquals(table['eggs'], [3, 1, 5, 2, 4])
+
+    def test_changed_block_should_be_pickled_only_when_unloaded(self):
+        rows = self.table._rows
+        rows.file.seek(0, 2)
+        size = rows.file.tell()
+        for index in range(3, 6):
+            self.table[index] = [index, 'changed', 0]
+        rows.file.seek(0, 2)
+        self.assertEquals(rows.file.tell(), size)
+        self.assertTrue(rows.dirty)
+        self.assertEquals(self.table[0], self.rows[0])
+        self.assertFalse(rows.dirty)
+        self.assertEquals(self.table[4], [4, u'changed', 0])
+        self.assertEquals(self.table[6:], self.expected[6:])
+
+    def test_insert_should_split_blocks(self):
+        for table in (self.table, self.expected):
+            for index in range(10):
+                table.insert(1, [100 + index, 'inserted', 0])
+        blocks = self.table._rows.blocks
+        self.assertTrue(all(block.length <= 3 for block in blocks))
+        self.assertTrue(all(block.rows is None for block in blocks[:-1]))
+        self.assertEquals(list(self.table), list(self.expected))
+
+    def test_slices_should_not_be_read_when_types_are_not_tracked(self):
+        read = []
+
+        class Rows(_SpilledRows):
+            def __getitem__(self, item):
+                read.append(item)
+                return _SpilledRows.__getitem__(self, item)
+        self.table._rows = Rows(1, self.rows, block_rows=3)
+        self.table[2:18] = [[2, 'changed', 0]]
+        del self.table[1:3]
+        del self.table[0]
+        self.assertEquals(read, [])
+        self.assertEquals(list(self.table), self.rows[18:])
+        self.table.track_types = True
+        del self.table[:1]
+        self.assertEquals(read[-1], slice(None, 1))
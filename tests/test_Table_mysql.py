@@ -271,6 +271,40 @@ class TestTableMySQL(unittest.TestCase):
                        query=sql.format(self.table))
         self.assertEquals(new_table[:], [[x] for x in range(507, 500, -1)])
 
+    def test_read_should_accept_columns(self):
+        self.connection.query('INSERT INTO %s VALUES (123, "a")' % self.table)
+        self.connection.query('INSERT INTO %s VALUES (456, "b")' % self.table)
+        self.connection.commit()
+        table = Table()
+        table.read('mysql', self.connection_string, columns=['field2'])
+        self.assertEquals(table.headers, ['field2'])
+        self.assertEquals(table[:], [[u'a'], [u'b']])
+        connection_string = '/'.join(self.connection_string.split('/')[:-1])
+        other_table = Table()
+        sql = 'SELECT * FROM {} WHERE field1 > 200'.format(self.table)
+        other_table.read('mysql', connection_string, query=sql,
+                         columns=['field2', 'field1'])
+        self.assertEquals(other_table.headers, ['field2', 'field1'])
+        self.assertEquals(other_table[:], [[u'b', 456]])
+
+    def test_read_should_accept_where(self):
+        self.connection.query('INSERT INTO %s VALUES (123, "a")' % self.table)
+        self.connection.query('INSERT INTO %s VALUES (456, "b")' % self.table)
+        self.connection.query('INSERT INTO %s VALUES (789, NULL)' % self.table)
+        self.connection.commit()
+        table = Table()
+        table.read('mysql', self.connection_string,
+                   where=[('field1', '>', 200), ('field2', '!=', None)])
+        self.assertEquals(table[:], [[456, u'b']])
+        table.read('mysql', self.connection_string,
+                   where=('field2', 'in', ['a', 'b']), columns=['field1'])
+        self.assertEquals(table[:], [[123], [456]])
+        table.read('mysql', self.connection_string,
+                   where=lambda row: row['field1'] % 2)
+        self.assertEquals(table[:], [[123, u'a'], [789, None]])
+        table.read('mysql', self.connection_string, where=[])
+        self.assertEquals(len(table), 3)
+
     def test_read_should_automatically_identify_data_types(self):
         self.connection.query('DROP TABLE ' + self.table)
         self.connection.commit()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright 2011 Álvaro Justen
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+import tempfile
+from cStringIO import StringIO
+from outputty import Table
+
+
+class TestTableScan(unittest.TestCase):
+    def setUp(self):
+        self.data = ('name,age,city\nana,30,rio\nbia,17,sp\ncaio,45,rio\n'
+                     'davi,20,bh\n')
+        self.table = Table()
+        temp = tempfile.NamedTemporaryFile(delete=False)
+        temp.write(self.data)
+        temp.close()
+        self.filename = temp.name
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def scan(self, **kwargs):
+        return self.table.scan('csv', self.filename, chunk_rows=2, **kwargs)
+
+    def test_scan_should_be_lazy(self):
+        scan = self.table.scan('csv', 'this file does not exist')
+        scan = scan.filter(('age', '>', 18)).select(['name'])
+        with self.assertRaises(IOError):
+            list(scan)
+
+    def test_filter_select_and_order_by(self):
+        scan = self.scan().filter(('age', '>=', 18)).select(['name', 'city'])
+        self.assertEquals(list(scan), [[u'ana', u'rio'], [u'caio', u'rio'],
+                                       [u'davi', u'bh']])
+        self.assertEquals(list(scan.order_by('name', 'desc')),
+                          [[u'davi', u'bh'], [u'caio', u'rio'],
+                           [u'ana', u'rio']])
+        scan = self.scan().order_by('age').select(['name', 'age'])
+        scan = scan.filter(lambda row: row['name'] != 'bia')
+        self.assertEquals(list(scan), [[u'davi', 20], [u'ana', 30],
+                                       [u'caio', 45]])
+
+    def test_first_steps_should_be_passed_to_the_plugin(self):
+        scan = self.scan().filter(('age', '>', 18)).filter(('city', '==',
+                                                            'rio'))
+        scan = scan.select(['name']).filter(('name', '!=', 'ana'))
+        headers, rows, types, widened, steps = scan._read()
+        self.assertEquals(headers, [u'name'])
+        self.assertEquals(list(rows), [[u'ana'], [u'caio']])
+        self.assertEquals(steps, [('filter', ('name', '!=', 'ana'))])
+        self.assertEquals(list(scan), [[u'caio']])
+
+    def test_functions_should_always_receive_converted_values(self):
+        adults = lambda row: row['age'] > 18
+        expected = [[u'ana', 30, u'rio'], [u'caio', 45, u'rio'],
+                    [u'davi', 20, u'bh']]
+        self.assertEquals(list(self.scan().filter(adults)), expected)
+        self.assertEquals(list(self.scan().order_by('name').filter(adults)),
+                          expected)
+        scan = self.scan().filter(adults)
+        headers, rows, types, widened, steps = scan._read()
+        self.assertEquals(steps, [('filter', adults)])
+
+    def test_chunks_should_use_the_types_of_the_first_ones(self):
+        data = 'spam,eggs\n0,\n1,\n2,\n3,a\n4,b\n5,c\n'
+        table = self.table.scan('csv', StringIO(data), chunk_rows=3)
+        table = table.order_by('eggs', 'desc').to_table()
+        self.assertEquals(table.types, {'spam': int, 'eggs': str})
+        self.assertEquals(table['spam'], [5, 4, 3, 0, 1, 2])
+        data = 'spam\n0\n1\n2\n3\n4\nn/a\n'
+        scan = self.table.scan('csv', StringIO(data), chunk_rows=3,
+                               types={'spam': int})
+        with self.assertRaises(ValueError):
+            scan.to_table()
+
+    def test_chunks_should_widen_types_that_dont_fit(self):
+        data = 'x,y\n0,2011-01-01\n1,\n2,2011-01-02\n3,4\n4,5\n1.5,6\n' \
+               'abc,7\n'
+        scan = lambda: self.table.scan('csv', StringIO(data), chunk_rows=3)
+        rows = list(scan())
+        self.assertEquals([row[0] for row in rows],
+                          [0, 1, 2, 3, 4, 1.5, u'abc'])
+        self.assertEquals([type(row[0]) for row in rows[:5]],
+                          [int, int, int, float, float])
+        table = scan().to_table()
+        read = Table()
+        read.read('csv', StringIO(data))
+        self.assertEquals(table.types, read.types)
+        self.assertEquals(table.types, {'x': str, 'y': str})
+        self.assertEquals(table['y'], read['y'])
+        self.assertEquals(table['x'], [u'0', u'1', u'2', u'3.0', u'4.0',
+                                       u'1.5', u'abc'])
+        table = scan().order_by('x', 'desc').to_table()
+        self.assertEquals(table['x'], [u'abc', u'4.0', u'3.0', u'2', u'1.5',
+                                       u'1', u'0'])
+        data = 'x\n1\n2\n3.5\n4\n'
+        table = self.table.scan('csv', StringIO(data), chunk_rows=2)
+        table = table.to_table()
+        self.assertEquals(table.types, {'x': float})
+        self.assertEquals([type(value) for value in table['x']], [float] * 4)
+
+    def test_to_table(self):
+        table = self.scan().select(['age', 'name']).to_table()
+        self.assertEquals(table.headers, [u'age', u'name'])
+        self.assertEquals(table['age'], [30, 17, 45, 20])
+        self.assertEquals(table.types, {'age': int, 'name': str})
+        empty = self.table.scan('csv', StringIO('name,age\n')).to_table()
+        self.assertEquals(empty.headers, [u'name', u'age'])
+        self.assertEquals(len(empty), 0)
+
+    def test_write_should_stream_to_csv_and_store_for_other_plugins(self):
+        scan = self.scan().filter(('city', '==', 'rio')).select(['name'])
+        self.assertEquals(scan.write('csv'), '"name"\n"ana"\n"caio"\n')
+        output = StringIO()
+        scan.write('csv', output)
+        self.assertEquals(output.getvalue(), '"name"\n"ana"\n"caio"\n')
+        self.assertEquals(scan.write('text'),
+                          '+------+\n| name |\n+------+\n|  ana |\n'
+                          '| caio |\n+------+')
+
+    def test_external_order_by_should_stream_sorted_rows(self):
+        scan = self.scan().select(['name', 'city'])
+        scan = scan.order_by([('city', 'desc'), 'name'], external=True,
+                             run_size=2)
+        self.assertEquals(scan.write('csv'),
+                          '"name","city"\n"bia","sp"\n"ana","rio"\n'
+                          '"caio","rio"\n"davi","bh"\n')
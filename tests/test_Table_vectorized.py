@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright 2011 Álvaro Justen
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import datetime
+from StringIO import StringIO
+from textwrap import dedent
+from outputty import Table, _normalize
+from outputty.vectorized import normalize
+
+
+class TestTableVectorized(unittest.TestCase):
+    def test_numpy_should_identify_and_convert_types_as_python(self):
+        rows = [['1', '2.71', '2011-01-01', '2011-01-01 02:03:04', 'asd'],
+                ['', None, '', None, ''],
+                ['-42', '3', '2012-02-29', '2012-12-31 23:59:59', u'Álvaro'],
+                ['007', '1e3', '2011-13-01', '2011-01-01', '42']]
+        table = Table(headers=['spam', 'eggs', 'ham', 'Monty', 'Python'])
+        table.extend(rows)
+        other = Table(headers=table.headers)
+        other.extend(rows)
+        table.normalize_types()
+        other.normalize_types(numpy=True)
+        self.assertEquals(other.types, table.types)
+        self.assertEquals(list(other), list(table))
+        self.assertEquals(other.types['spam'], float)
+        self.assertEquals(other.types['ham'], str)
+
+    def test_numpy_should_convert_dates_and_datetimes(self):
+        column = [u'2011-01-01 02:03:04', None, u'2012-12-31 23:59:59']
+        self.assertEquals(normalize(column, 'utf8'),
+                          (datetime.datetime,
+                           [datetime.datetime(2011, 1, 1, 2, 3, 4), None,
+                            datetime.datetime(2012, 12, 31, 23, 59, 59)]))
+        self.assertEquals(normalize([u'2011-01-01', u''], 'utf8'),
+                          (datetime.date, [datetime.date(2011, 1, 1), None]))
+
+    def test_numpy_should_fallback_to_python_on_big_integers(self):
+        column = [u'1', u'123456789012345678901234567890']
+        self.assertEquals(normalize(column, 'utf8'),
+                          (int, [1, 123456789012345678901234567890]))
+
+    def test_numpy_should_fallback_to_python_on_values_other_than_strings(self):
+        for column in ([True, u'1'], [1, u'2.5'], [None, 3, u'']):
+            self.assertEquals(normalize(column, 'utf8'),
+                              _normalize(column, 'utf8'))
+        self.assertEquals(normalize([True, u'1'], 'utf8')[0], float)
+
+    def test_csv_read_with_numpy(self):
+        data = dedent('''\
+        spam,eggs,ham
+        1,2.5,2011-01-01
+        2,,2011-01-02
+        ''')
+        table = Table()
+        table.read('csv', StringIO(data), numpy=True)
+        other = Table()
+        other.read('csv', StringIO(data))
+        self.assertEquals(table.types, other.types)
+        self.assertEquals(list(table), list(other))